@@ -1,42 +1,101 @@
-from flask import Flask, render_template, Response, request, jsonify, send_file
+from flask import Flask, render_template, Response, request, jsonify, send_file, g, url_for
 import cv2
-import mediapipe as mp
 import numpy as np
 import os
 import json
-from collections import deque
 from datetime import datetime
 import threading
 import time
 import io
 import base64
+import hashlib
+from concurrent.futures import wait as wait_for_futures
+from garment_cache import GarmentCache
+from compositing import composite
+from pipeline import FramePipeline
+from broadcaster import FrameBroadcaster
+from inference import create_engine
+from inference_workers import InferenceWorkerPool
+from inference_scheduler import InferenceResult
+from idle_detector import IdleDetector
+from landmarks import (to_landmark_list, LEFT_SHOULDER, RIGHT_SHOULDER, WRIST, THUMB_MCP, THUMB_TIP,
+                       INDEX_FINGER_MCP, INDEX_FINGER_TIP)
+from sessions import SessionStore
+from frame_upload import FrameUploadService, StreamBusy
+from stream_encoding import EncodingProfile, FrameEncoder, AdaptiveQuality
+from frame_sources import open_source
+from metrics import Metrics, SamplingProfiler
+from photo_capture import CaptureUnavailable, PhotoCapture
+from photo_gallery import PhotoGallery
+from shirt_catalog import ShirtCatalog
+from lookbook import detect_pose, render_lookbook
+from startup import Startup
 
 app = Flask(__name__)
 
-# Initialize MediaPipe Pose and Hands
-mp_pose = mp.solutions.pose
-mp_hands = mp.solutions.hands
-mp_drawing = mp.solutions.drawing_utils
-pose = mp_pose.Pose(static_image_mode=False, min_detection_confidence=0.5, min_tracking_confidence=0.5)
-hands = mp_hands.Hands(static_image_mode=False, max_num_hands=2, min_detection_confidence=0.5, min_tracking_confidence=0.5)
+# Per-stage timing histograms, served on /metrics; the profiler is toggled with /api/profiler
+metrics = Metrics()
+profiler = SamplingProfiler()
+
+# Pose every frame, hands every 3rd (both every frame for a while after fast movement);
+# models see a frame at most 640px on its longest side, cropped around the tracked body
+inference_options = dict(pose_every=1, hands_every=3, region_mode='crop', max_side=640)
+
+# TRYON_INFERENCE_WORKERS=<n> runs the models in n worker processes fed through
+# shared memory (see inference_workers.py); 0 keeps them in this process. The
+# workers only import inference.py and report their model timings to metrics.
+inference_worker_count = int(os.environ.get('TRYON_INFERENCE_WORKERS', '0'))
+inference_pool = None
+if inference_worker_count > 0:
+    inference_pool = InferenceWorkerPool(create_engine, workers=inference_worker_count,
+                                         engine_options=inference_options, metrics=metrics)
+
+def create_inference_engine():
+    """Pose and hands models for one video stream (see inference.py)"""
+    if inference_pool is not None:
+        return inference_pool.engine()
+    return create_engine(metrics=metrics, **inference_options)
+
+# The webcam's engine; created by the start-up thread (see START-UP below)
+camera_inference = None
 
 # Shirt images
 shirtFolderPath = "./static/Shirts"
-listShirts = os.listdir(shirtFolderPath) if os.path.exists(shirtFolderPath) else []
 fixedRatio = 262 / 190
 shirtRatioHeightWidth = 591 / 490
-imageNumber = 0
+# Decoded garments are bounded (see garment_cache.py); only the first ones are decoded at start-up
+garment_cache = GarmentCache(shirtFolderPath)
+GARMENT_PRELOAD = 32
 
 # Button images
-counterRight = 0
-counterLeft = 0
 selectionSpeed = 10
-smooth_buffer = deque(maxlen=5)
+
+# Where frames come from: device:<index>, a video file, an image directory or
+# synthetic:<width>x<height> (see frame_sources.py). Anything but a camera is
+# replayed at TRYON_FRAME_FPS (a video file defaults to its own frame rate)
+frame_source_spec = os.environ.get('TRYON_FRAME_SOURCE', 'device:0')
+frame_source_fps = float(os.environ.get('TRYON_FRAME_FPS') or 0) or None
+
+# Shoulder smoothing: average (last 5 frames), one_euro or kalman (see landmark_filter.py)
+smoothing_mode = os.environ.get('TRYON_SMOOTHING', 'average')
 
 # NEW: Photo capture storage
 captured_photos_dir = "./static/captured_photos"
 os.makedirs(captured_photos_dir, exist_ok=True)
-latest_captured_frame = None
+
+def env_limit(name, default, scale=1):
+    """A numeric limit from the environment; 0 or empty turns it off"""
+    value = float(os.environ.get(name, default) or 0)
+    return value * scale if value > 0 else None
+
+# Photo index, thumbnails and retention (see photo_gallery.py); the index lives
+# outside static/ so it is not served, at TRYON_PHOTO_INDEX if set
+photo_gallery = PhotoGallery(captured_photos_dir, os.environ.get('TRYON_PHOTO_INDEX', './captured_photos.sqlite3'),
+                             max_age=env_limit('TRYON_PHOTO_MAX_AGE_DAYS', 0, 24 * 3600),
+                             max_bytes=env_limit('TRYON_PHOTO_MAX_GB', 20, 1024 ** 3),
+                             max_count=env_limit('TRYON_PHOTO_MAX_COUNT', 0))
+# Photos are annotated, encoded and written off the frame loop (see photo_capture.py)
+photo_capture = PhotoCapture(captured_photos_dir, photo_gallery)
 
 # ORIGINAL OVERLAY FUNCTION (PRESERVED)
 def overlay_image_alpha(background, overlay, x, y):
@@ -58,39 +117,44 @@ def overlay_image_alpha(background, overlay, x, y):
     background[y:y+h, x:x+w] = (1.0 - mask) * background[y:y+h, x:x+w] + mask * overlay_image
     return background
 
-# Global state for new features (doesn't interfere with original)
-app_state = {
-    'cart_items': [],
-    'camera_active': True,
-    'fit_detection': 85,
-    'tracking_quality': 80,
-    'gesture_detected': None,
-    'last_gesture_time': 0,
-    'show_pose_landmarks': True,
-    'overlay_opacity': 0.8,
-    'capture_requested': False,
-    'shirt_overlay_active': True,
-    'last_captured_photo': None
-}
+# Try-on state (cart, selected shirt, toggles, ...) lives in one TryOnSession per
+# browser/kiosk instead of module globals, see sessions.py
+SESSION_COOKIE = 'tryon_session'
+sessions = SessionStore(ttl=30 * 60, smoothing=smoothing_mode)
+
+def current_session():
+    """Session for this request: ?session=, X-Session-Id header or cookie, created if missing"""
+    if 'tryon_session' not in g:
+        session_id = (request.args.get('session') or request.headers.get('X-Session-Id')
+                      or request.cookies.get(SESSION_COOKIE))
+        g.tryon_session = sessions.get(session_id)
+    return g.tryon_session
+
+@app.after_request
+def remember_session(response):
+    session = g.get('tryon_session')
+    if session is not None and request.cookies.get(SESSION_COOKIE) != session.session_id:
+        response.set_cookie(SESSION_COOKIE, session.session_id, max_age=sessions.ttl, samesite='Lax')
+    return response
+
+def make_shirt_info(shirt_id, shirt):
+    """Inventory details for one shirt image; ``shirt_id`` is stable, so the price is too"""
+    shirt_name = os.path.splitext(shirt)[0]
+    return {
+        'id': shirt_id,
+        'name': format_shirt_name(shirt_name),
+        'filename': shirt,
+        'price': 29.99 + (shirt_id % 7) * 5,
+        'brand': extract_brand_from_name(shirt_name),
+        'size': 'M',
+        'material': 'Cotton Blend',
+        'in_stock': True,
+        'image_path': f'/static/Shirts/{shirt}'
+    }
 
 def get_shirt_inventory():
     """Get complete shirt inventory with details"""
-    inventory = []
-    for i, shirt in enumerate(listShirts):
-        shirt_name = os.path.splitext(shirt)[0]
-        shirt_info = {
-            'id': i,
-            'name': format_shirt_name(shirt_name),
-            'filename': shirt,
-            'price': 29.99 + (i * 5),
-            'brand': extract_brand_from_name(shirt_name),
-            'size': 'M',
-            'material': 'Cotton Blend',
-            'in_stock': True,
-            'image_path': f'/static/Shirts/{shirt}'
-        }
-        inventory.append(shirt_info)
-    return inventory
+    return catalog.items()
 
 def format_shirt_name(filename):
     """Format shirt name from filename"""
@@ -106,44 +170,55 @@ def extract_brand_from_name(filename):
             return brand
     return brands[len(filename) % len(brands)]
 
+# Shirt inventory, rescanned when the shirt folder changes (see shirt_catalog.py)
+catalog = ShirtCatalog(shirtFolderPath, make_shirt_info)
+
+# Gesture distances as fractions of the frame, so they mean the same at any
+# resolution (the original 40/60 px were tuned on a 640x480 webcam)
+GESTURE_THUMB_RISE = 40 / 480
+GESTURE_POINT_REACH = 60 / 640
+GESTURE_POINT_LEVEL = 40 / 480
+
 def detect_hand_gesture(hand_landmarks, image_width, image_height):
     """Enhanced hand gesture detection for new features"""
-    if not hand_landmarks:
+    if hand_landmarks is None:
         return None
     
-    landmarks = hand_landmarks.landmark
-    wrist = landmarks[mp_hands.HandLandmark.WRIST]
-    thumb_tip = landmarks[mp_hands.HandLandmark.THUMB_TIP]
-    thumb_mcp = landmarks[mp_hands.HandLandmark.THUMB_MCP]
-    index_tip = landmarks[mp_hands.HandLandmark.INDEX_FINGER_TIP]
-    index_mcp = landmarks[mp_hands.HandLandmark.INDEX_FINGER_MCP]
+    # hand_landmarks is a (21, 3) array of normalised x, y, z (see landmarks.py)
+    landmarks = hand_landmarks
+    wrist = landmarks[WRIST]
+    thumb_tip = landmarks[THUMB_TIP]
+    thumb_mcp = landmarks[THUMB_MCP]
+    index_tip = landmarks[INDEX_FINGER_TIP]
+    index_mcp = landmarks[INDEX_FINGER_MCP]
     
-    wrist_x, wrist_y = int(wrist.x * image_width), int(wrist.y * image_height)
-    thumb_x, thumb_y = int(thumb_tip.x * image_width), int(thumb_tip.y * image_height)
-    index_x, index_y = int(index_tip.x * image_width), int(index_tip.y * image_height)
+    wrist_x, wrist_y = int(wrist[0] * image_width), int(wrist[1] * image_height)
+    thumb_x, thumb_y = int(thumb_tip[0] * image_width), int(thumb_tip[1] * image_height)
+    index_x, index_y = int(index_tip[0] * image_width), int(index_tip[1] * image_height)
+    rise = GESTURE_THUMB_RISE * image_height
+    reach = GESTURE_POINT_REACH * image_width
+    level = GESTURE_POINT_LEVEL * image_height
     
     # Thumbs up = Add to cart
-    if (thumb_y < wrist_y - 40 and thumb_tip.y < thumb_mcp.y and index_tip.y > index_mcp.y):
+    if (thumb_y < wrist_y - rise and thumb_tip[1] < thumb_mcp[1] and index_tip[1] > index_mcp[1]):
         return "add_to_cart"
     
     # Point right = Next shirt
-    if (index_x > wrist_x + 60 and abs(index_y - wrist_y) < 40 and index_tip.x > index_mcp.x):
+    if (index_x > wrist_x + reach and abs(index_y - wrist_y) < level and index_tip[0] > index_mcp[0]):
         return "next_shirt"
     
     # Point left = Previous shirt
-    if (index_x < wrist_x - 60 and abs(index_y - wrist_y) < 40 and index_tip.x < index_mcp.x):
+    if (index_x < wrist_x - reach and abs(index_y - wrist_y) < level and index_tip[0] < index_mcp[0]):
         return "previous_shirt"
     
     return None
 
-def add_current_shirt_to_cart():
+def add_current_shirt_to_cart(session):
     """Add current shirt to cart"""
-    if len(listShirts) > 0:
-        inventory = get_shirt_inventory()
-        current_shirt_info = inventory[imageNumber]
-        
-        if not any(item['id'] == current_shirt_info['id'] for item in app_state['cart_items']):
-            app_state['cart_items'].append({
+    current_shirt_info = catalog.get(session.image_number)
+    if current_shirt_info is not None:
+        if not any(item['id'] == current_shirt_info['id'] for item in session.cart_items):
+            session.cart_items.append({
                 'id': current_shirt_info['id'],
                 'name': current_shirt_info['name'],
                 'price': current_shirt_info['price'],
@@ -154,285 +229,886 @@ def add_current_shirt_to_cart():
             return True
     return False
 
-def save_captured_photo(frame):
-    """Save captured photo with timestamp"""
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    filename = f"virtual_tryout_{timestamp}.jpg"
-    filepath = os.path.join(captured_photos_dir, filename)
-    
-    # Add metadata overlay to the photo
-    height, width = frame.shape[:2]
+def photo_caption(session):
+    """Banner lines written onto a captured photo"""
+    lines = ["Clothy Virtual Store (G11)", f"Captured: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"]
+    shirt_info = catalog.get(session.image_number)
+    if shirt_info is not None:
+        lines.append(f"Shirt: {shirt_info['name']}")
+    return lines
+
+# A session counts as rendering if it is the webcam's and someone watches the
+# video, or if a frame was drawn for it (uploaded frames) this recently
+RENDERING_RECENTLY = 2.0
+
+def is_rendering(session):
+    """Whether frames are being drawn for this session, so a capture request will be picked up"""
+    if session is camera_session and any(isinstance(kind, EncodingProfile) for kind in camera_broadcaster.kinds()):
+        return True
+    return time.monotonic() - session.last_rendered < RENDERING_RECENTLY
+
+def request_photo(session):
+    """Ask the next rendered frame of this session to be saved; returns the CaptureJob
     
-    # Add a semi-transparent overlay with photo info
-    overlay = frame.copy()
-    cv2.rectangle(overlay, (10, height - 80), (400, height - 10), (0, 0, 0), -1)
-    cv2.addWeighted(frame, 0.7, overlay, 0.3, 0, frame)
+    A request made while one is still waiting for its frame returns that
+    pending job. One made while nothing renders the session fails at once.
+    """
+    def remember(future):
+        if future.exception() is None:
+            with session.lock:
+                session.last_captured_photo = future.result()
+                session.mark_changed()
     
-    # Add text information
-    cv2.putText(frame, f"Clothy Virtual Store (G11)", (20, height - 60), 
-               cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
-    cv2.putText(frame, f"Captured: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}", 
-               (20, height - 40), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
+    with session.lock:
+        pending = session.capture_requested
+        if pending is not None and not pending.future.done():
+            return pending
+        job = photo_capture.request(session.session_id)
+        if not is_rendering(session):
+            photo_capture.fail(job, CaptureUnavailable('Nothing is rendering this session; open the video feed first'))
+            return job
+        job.future.add_done_callback(remember)
+        session.capture_requested = job
+    return job
+
+# ENHANCED FRAME GENERATION
+# The frame loop is split into capture -> inference -> render/encode stages that
+# FramePipeline runs on separate threads (see pipeline.py).
+
+def capture_frame(source):
+    """Capture stage: read and mirror one frame from a FrameSource (None at end of stream)"""
+    start = time.perf_counter()
+    image = source.read()
+    if image is None:
+        return None
+    image = cv2.flip(image, 1)
+    metrics.observe('capture', time.perf_counter() - start)
+    return image
+
+def apply_gestures(session, results, image_width, image_height, current_time):
+    """Act on hand gestures: next/previous shirt and add to cart"""
+    # Enhanced hand gesture detection
+    if results.hands:
+        for hand_landmarks in results.hands:
+            gesture = detect_hand_gesture(hand_landmarks, image_width, image_height)
+            
+            if gesture and current_time - session.last_gesture_time > 1.5:
+                session.gesture_detected = gesture
+                session.last_gesture_time = current_time
+                session.mark_changed()
+                
+                if gesture == "next_shirt" and len(catalog) > 0:
+                    session.image_number = (session.image_number + 1) % len(catalog)
+                elif gesture == "previous_shirt" and len(catalog) > 0:
+                    session.image_number = (session.image_number - 1) % len(catalog)
+                elif gesture == "add_to_cart":
+                    add_current_shirt_to_cart(session)
+
+# Seconds between status events caused only by fit_detection/tracking_quality
+FIT_METRICS_INTERVAL = 1.0
+
+def compute_placement(session, results, image_width, image_height):
+    """Smooth the shoulders and work out where the shirt goes (None without a pose or with the overlay off)"""
+    # ORIGINAL POSE DETECTION AND SHIRT PLACEMENT
+    if results.pose is None or not session.shirt_overlay_active:
+        return None
+    # Rows follow PLACEMENT_LANDMARKS: left shoulder, right shoulder, left hip, right hip
+    smoothed = session.tracker.update(results.pose, image_width, image_height, time.monotonic())
+    avg_lm11 = (int(smoothed[0, 0]), int(smoothed[0, 1]))
+    avg_lm12 = (int(smoothed[1, 0]), int(smoothed[1, 1]))
+    shirt_width, shirt_height, shirt_top_left = shirt_box(avg_lm11, avg_lm12)
     
-    if len(listShirts) > 0:
-        inventory = get_shirt_inventory()
-        current_shirt = inventory[imageNumber]
-        cv2.putText(frame, f"Shirt: {current_shirt['name']}", 
-                   (20, height - 20), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
+    shirt = shirt_info = None
+    if len(catalog) > 0:
+        # Shirts may have been removed since this session picked one
+        session.image_number %= len(catalog)
+        shirt_info = catalog.get(session.image_number)
+        shirt = shirt_info['filename'] if shirt_info is not None else None
+        # Update fit metrics
+        fit_detection = min(85 + (shirt_width % 15), 98)
+        tracking_quality = min(80 + (len(session.tracker) * 4), 95)
+        if (fit_detection, tracking_quality) != (session.fit_detection, session.tracking_quality):
+            session.fit_detection = fit_detection
+            session.tracking_quality = tracking_quality
+            # These move with shoulder jitter, so they wake the status streams at most once an interval
+            now = time.monotonic()
+            if now - session.metrics_notified >= FIT_METRICS_INTERVAL:
+                session.metrics_notified = now
+                session.mark_changed()
     
-    cv2.imwrite(filepath, frame)
-    return filename
+    return {
+        'shirt_id': shirt_info['id'] if shirt_info is not None else None,
+        'shirt': shirt,
+        'left_shoulder': avg_lm11,
+        'right_shoulder': avg_lm12,
+        'shirt_width': shirt_width,
+        'shirt_height': shirt_height,
+        'shirt_top_left': shirt_top_left
+    }
 
-# ENHANCED FRAME GENERATION
-def gen_frames():
-    global imageNumber, counterRight, counterLeft, app_state, latest_captured_frame
-    cap = cv2.VideoCapture(0)
+def shirt_box(left_shoulder, right_shoulder):
+    """Shirt width, height and top-left corner for two shoulder pixel positions"""
+    shirt_width = int(abs(left_shoulder[0] - right_shoulder[0]) * fixedRatio)
+    shirt_height = int(shirt_width * shirtRatioHeightWidth)
+    # The compositor clips at the frame edges, so the garment is not shifted to stay inside
+    shirt_top_left = (
+        min(left_shoulder[0], right_shoulder[0]) - int(shirt_width * 0.15),
+        min(left_shoulder[1], right_shoulder[1]) - int(shirt_height * 0.2)
+    )
+    return shirt_width, shirt_height, shirt_top_left
+
+def shirt_box_for_pose(pose, image_width, image_height):
+    """(x, y, width, height) of the shirt for an unsmoothed pose, or None if the shoulders overlap"""
+    left = pose[LEFT_SHOULDER]
+    right = pose[RIGHT_SHOULDER]
+    shirt_width, shirt_height, (x, y) = shirt_box((int(left[0] * image_width), int(left[1] * image_height)),
+                                                  (int(right[0] * image_width), int(right[1] * image_height)))
+    if shirt_width <= 0 or shirt_height <= 0:
+        return None
+    return x, y, shirt_width, shirt_height
+
+def lookbook_garments(items):
+    """(filename, label) pairs for the lookbook renderer"""
+    return [(item['filename'], f"{item['name']} ${item['price']:.2f}") for item in items]
+
+def update_session(session, results, image_width, image_height):
+    """Apply gestures and compute the shirt placement for one frame"""
+    with session.lock:
+        session.touch()
+        apply_gestures(session, results, image_width, image_height, time.time())
+        return compute_placement(session, results, image_width, image_height)
+
+def render_frame(session, image, results):
+    """Compositor stage: apply gestures, shirt overlay, photo capture and UI overlays"""
+    with session.lock:
+        placement = update_session(session, results, image.shape[1], image.shape[0])
+        return draw_frame(session, image, results, placement)
+
+def draw_frame(session, image, results, placement, hand_off=False):
+    """Draw the shirt, landmarks and UI overlays for an already computed placement
     
-    while True:
-        success, image = cap.read()
-        if not success:
-            break
-        
-        # ORIGINAL CORE FUNCTIONALITY
-        image = cv2.flip(image, 1)
-        image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-        pose_results = pose.process(image_rgb)
-        hands_results = hands.process(image_rgb)
-        
+    With ``hand_off`` a frame that is captured as a photo is given to the
+    photo writer as is and None is returned instead of drawing on it further.
+    """
+    with session.lock:
         current_time = time.time()
         
-        # Enhanced hand gesture detection
-        if hands_results.multi_hand_landmarks:
-            for hand_landmarks in hands_results.multi_hand_landmarks:
-                gesture = detect_hand_gesture(hand_landmarks, image.shape[1], image.shape[0])
-                
-                if gesture and current_time - app_state['last_gesture_time'] > 1.5:
-                    app_state['gesture_detected'] = gesture
-                    app_state['last_gesture_time'] = current_time
-                    
-                    if gesture == "next_shirt" and len(listShirts) > 0:
-                        imageNumber = (imageNumber + 1) % len(listShirts)
-                    elif gesture == "previous_shirt" and len(listShirts) > 0:
-                        imageNumber = (imageNumber - 1) % len(listShirts)
-                    elif gesture == "add_to_cart":
-                        add_current_shirt_to_cart()
-        
-        # ORIGINAL POSE DETECTION AND SHIRT OVERLAY
-        if pose_results.pose_landmarks and app_state['shirt_overlay_active']:
-            lm11 = pose_results.pose_landmarks.landmark[mp_pose.PoseLandmark.LEFT_SHOULDER]
-            lm12 = pose_results.pose_landmarks.landmark[mp_pose.PoseLandmark.RIGHT_SHOULDER]
-            ih, iw, _ = image.shape
-            lm11_px = (int(lm11.x * iw), int(lm11.y * ih))
-            lm12_px = (int(lm12.x * iw), int(lm12.y * ih))
-            smooth_buffer.append((lm11_px, lm12_px))
-            avg_lm11 = tuple(np.mean([p[0] for p in smooth_buffer], axis=0).astype(int))
-            avg_lm12 = tuple(np.mean([p[1] for p in smooth_buffer], axis=0).astype(int))
-            shirt_width = int(abs(avg_lm11[0] - avg_lm12[0]) * fixedRatio)
-            shirt_height = int(shirt_width * shirtRatioHeightWidth)
-            shirt_top_left = (
-                max(0, min(iw - shirt_width, min(avg_lm11[0], avg_lm12[0]) - int(shirt_width * 0.15))),
-                max(0, min(ih - shirt_height, min(avg_lm11[1], avg_lm12[1]) - int(shirt_height * 0.2)))
-            )
-            
+        if placement is not None:
             # ORIGINAL SHIRT OVERLAY
-            if len(listShirts) > 0:
-                imgShirtPath = os.path.join(shirtFolderPath, listShirts[imageNumber])
-                imgShirt = cv2.imread(imgShirtPath, cv2.IMREAD_UNCHANGED)
+            if placement['shirt'] is not None:
+                with metrics.time('garment'):
+                    garment_cache.track(catalog.version)
+                    imgShirt = garment_cache.get(placement['shirt'], placement['shirt_width'], placement['shirt_height'])
                 if imgShirt is not None:
-                    imgShirt = cv2.resize(imgShirt, (shirt_width, shirt_height))
-                    image = overlay_image_alpha(image, imgShirt, shirt_top_left[0], shirt_top_left[1])
-                    
-                    # Update fit metrics
-                    app_state['fit_detection'] = min(85 + (shirt_width % 15), 98)
-                    app_state['tracking_quality'] = min(80 + (len(smooth_buffer) * 4), 95)
+                    with metrics.time('composite'):
+                        image = composite(image, imgShirt, *placement['shirt_top_left'])
             
             # ORIGINAL POSE LANDMARKS
-            if app_state['show_pose_landmarks']:
-                mp_drawing.draw_landmarks(image, pose_results.pose_landmarks, mp_pose.POSE_CONNECTIONS)
+            if session.show_pose_landmarks:
+                with metrics.time('landmarks'):
+                    draw_pose_landmarks(image, results.pose)
         
         # Handle photo capture
-        if app_state['capture_requested']:
-            latest_captured_frame = image.copy()
-            filename = save_captured_photo(latest_captured_frame)
-            app_state['capture_requested'] = False
-            app_state['last_captured_photo'] = filename
+        session.last_rendered = time.monotonic()
+        if session.capture_requested is not None:
+            job = session.capture_requested
+            session.capture_requested = None
+            shirt = catalog.filename(session.image_number)
+            if hand_off:
+                # The writer owns this frame now; viewers keep the previous frame for one tick
+                if photo_capture.submit(job, image, photo_caption(session), shirt):
+                    return None
+            else:
+                photo_capture.submit(job, image.copy(), photo_caption(session), shirt)
         
         # Add UI overlays
-        add_ui_overlays(image, current_time)
-        
-        # ORIGINAL FRAME ENCODING
+        with metrics.time('overlays'):
+            add_ui_overlays(image, current_time, session)
+        return image
+
+def draw_pose_landmarks(image, pose):
+    """Draw the pose skeleton with MediaPipe's drawing utilities"""
+    import mediapipe as mp
+    mp.solutions.drawing_utils.draw_landmarks(image, to_landmark_list(pose), mp.solutions.pose.POSE_CONNECTIONS)
+
+def encode_frame(image):
+    """Encoder stage: JPEG-encode a rendered frame"""
+    with metrics.time('encode'):
         ret, buffer = cv2.imencode('.jpg', image)
-        frame = buffer.tobytes()
-        yield (b'--frame\r\n'
-               b'Content-Type: image/jpeg\r\n\r\n' + frame + b'\r\n')
+    return buffer.tobytes()
+
+def capture_camera_frame(source):
+    """Capture stage for the webcam: only a few frames a second go on while the scene is idle
     
-    cap.release()
+    The camera keeps being read at its own rate and the frames in between are
+    dropped, so the driver never hands out a stale buffered frame on waking.
+    """
+    while camera_idle.capture_delay(time.monotonic()) > 0:
+        if not source.grab():
+            return None
+    image = capture_frame(source)
+    if image is not None:
+        camera_idle.observe_frame(image, time.monotonic())
+    return image
+
+def infer_camera_frame(image):
+    """Inference stage for the webcam: the models only run now and then while the scene is idle"""
+    now = time.monotonic()
+    if not camera_idle.should_infer(now):
+        return InferenceResult()
+    results = camera_inference(image)
+    camera_idle.observe_pose(results.pose is not None, now)
+    return results
+
+def compose_camera_frame(image, results):
+    """Compose stage for the webcam: only produce the outputs someone is subscribed to"""
+    global camera_last_output
+    session = camera_session
+    kinds = camera_broadcaster.kinds()
+    if camera_idle.idle and camera_last_output is not None and session.capture_requested is None:
+        # Nobody there and nothing moving: unless the page changed the session
+        # (shirt, cart, toggles) the last frame's encoded bytes are sent again
+        payload, last_session, version = camera_last_output
+        if last_session is session and version == session.version and set(payload) == kinds:
+            session.touch()
+            camera_idle.reuse()
+            return payload
+    version = session.version
+    with metrics.time('placement'):
+        placement = update_session(session, results, image.shape[1], image.shape[0])
+    payload = {}
+    if camera_broadcaster.wants('placement'):
+        message = dict(placement_message(placement, image), ts=round(time.time(), 3))
+        payload['placement'] = json.dumps(message, separators=(',', ':')).encode() + b'\n'
+    profiles = [kind for kind in camera_broadcaster.kinds() if isinstance(kind, EncodingProfile)]
+    if profiles:
+        image = draw_frame(session, image, results, placement, hand_off=True)
+        if image is not None:
+            with metrics.time('encode'):
+                payload.update(camera_encoder.encode(image, profiles))
+    camera_last_output = (payload, session, version)
+    return payload
+
+def start_camera_pipeline(sink):
+    """Open the webcam (or configured frame source) and start the shared pipeline feeding the broadcaster"""
+    source = open_source(frame_source_spec, loop=True, realtime=True, fps=frame_source_fps)
+    pipeline = FramePipeline(lambda: capture_camera_frame(source), infer_camera_frame, compose_camera_frame,
+                             sink=sink, close=source.release)
+    return pipeline.start()
+
+# One camera, one inference pass per frame, any number of /video_feed viewers.
+# The webcam renders with one session: TRYON_CAMERA_SESSION if set, otherwise
+# that of the viewer that started it, until the last viewer leaves. Other
+# viewers only watch and cannot take over the kiosk's shirt, cart or photos.
+camera_broadcaster = FrameBroadcaster(start_camera_pipeline)
+camera_session_id = os.environ.get('TRYON_CAMERA_SESSION')
+camera_session = None
+camera_session_lock = threading.Lock()
+camera_encoder = FrameEncoder()
+
+# With nobody in front of the camera for TRYON_IDLE_AFTER seconds (0 never) the
+# webcam drops to 4 fps, runs the models once a second and re-sends its last
+# frame; motion or a pose brings it straight back (see idle_detector.py)
+camera_idle = IdleDetector(idle_after=env_limit('TRYON_IDLE_AFTER', 5) or float('inf'))
+camera_last_output = None
+
+# Frames uploaded by browsers/remote kiosks: one inference engine per session,
+# at most 4 frames processed and 8 accepted at a time across all clients
+upload_service = FrameUploadService(create_inference_engine, max_workers=4, max_pending=8)
+
+def camera_pipeline_stats():
+    pipeline = camera_broadcaster.pipeline
+    return pipeline.stats() if pipeline is not None else None
 
-def add_ui_overlays(image, current_time):
+def camera_dropped_frames():
+    stats = camera_pipeline_stats()
+    stages = stats['stages'] if stats else {}
+    return {queue: stages.get(queue, {}).get('dropped', 0) for queue in ('inference', 'compose', 'output')}
+
+def camera_streams_by_kind():
+    counts = {'jpeg': 0, 'webp': 0, 'placement': 0}
+    for kind in camera_broadcaster.subscriber_kinds():
+        counts[kind.format if isinstance(kind, EncodingProfile) else kind] += 1
+    return counts
+
+metrics.gauge('camera_fps', 'Frames per second the webcam pipeline actually delivers',
+              lambda: (camera_pipeline_stats() or {}).get('fps', 0))
+metrics.gauge('camera_latency_seconds', 'Capture to output latency of the webcam pipeline',
+              lambda: (camera_pipeline_stats() or {}).get('latency_ms', 0) / 1000)
+metrics.gauge('camera_frames_total', 'Frames published by the webcam pipeline',
+              lambda: camera_broadcaster.published, kind='counter')
+metrics.gauge('pipeline_dropped_frames_total', 'Frames a pipeline stage dropped because the next one was busy',
+              camera_dropped_frames, kind='counter', label='queue')
+metrics.gauge('viewer_skipped_frames_total', 'Frames skipped by viewers that could not keep up',
+              lambda: camera_broadcaster.skipped, kind='counter')
+metrics.gauge('active_streams', 'Open webcam streams by kind', camera_streams_by_kind, label='kind')
+metrics.gauge('upload_streams', 'Clients currently uploading frames', lambda: upload_service.stats()['streams'])
+metrics.gauge('upload_frames_total', 'Uploaded frames by outcome',
+              lambda: {'processed': upload_service.processed, 'rejected': upload_service.rejected},
+              kind='counter', label='outcome')
+metrics.gauge('camera_idle', 'Whether the webcam scene is idle (1) or active (0)', lambda: int(camera_idle.idle))
+metrics.gauge('active_sessions', 'Try-on sessions that have not expired', lambda: len(sessions))
+
+# START-UP
+# MediaPipe, the models, the shirt list, the photo index and the garment cache
+# are loaded on a background thread so the page, static files and API answer
+# straight away. /readyz reports the progress; /video_feed shows a placeholder until it is done.
+def load_models():
+    global camera_inference
+    camera_inference = create_inference_engine()
+
+def warm_models(frames=3):
+    """Run a few blank frames so the first camera frame does not pay for graph set-up"""
+    blank = np.zeros((480, 640, 3), dtype=np.uint8)
+    for _ in range(frames):
+        camera_inference(blank)
+
+startup = Startup([
+    ('catalog', lambda: catalog.refresh(force=True)),
+    ('gallery', photo_gallery.sync),
+    ('models', load_models),
+    ('warmup', warm_models),
+    ('garments', lambda: garment_cache.preload(catalog.filenames(), limit=GARMENT_PRELOAD)),
+])
+
+def startup_placeholder(profile, text='Starting camera...'):
+    """A small status frame for viewers that connect before the models are ready"""
+    image = np.zeros((360, 640, 3), dtype=np.uint8)
+    (width, _), _ = cv2.getTextSize(text, cv2.FONT_HERSHEY_SIMPLEX, 0.9, 2)
+    cv2.putText(image, text, ((640 - width) // 2, 190), cv2.FONT_HERSHEY_SIMPLEX, 0.9, (255, 255, 255), 2)
+    return FrameEncoder().encode(image, [profile])[profile]
+
+def placement_message(placement, image):
+    """JSON-ready shirt placement for one frame, for clients that draw the garment themselves"""
+    return {
+        'frame_width': image.shape[1],
+        'frame_height': image.shape[0],
+        'placement': placement
+    }
+
+def subscribe_camera(session, kind):
+    """Subscribe to the webcam; the viewer that starts it binds the session it renders with"""
+    global camera_session
+    with camera_session_lock:
+        pipeline = camera_broadcaster.pipeline
+        if pipeline is None or not pipeline.running:
+            camera_session = sessions.get(camera_session_id) if camera_session_id else session
+        return camera_broadcaster.subscribe(kind)
+
+def gen_frames(session, profile):
+    if not startup.ready:
+        placeholder = startup_placeholder(profile)
+        while not startup.wait(0.5):
+            if startup.failed:
+                # Show the failure once and end the stream; reload the page after a retry
+                yield from startup_placeholder(profile, 'Camera failed to start').chunks()
+                return
+            yield from placeholder.chunks()
+    subscriber = subscribe_camera(session, profile)
+    quality = AdaptiveQuality(profile)
+    try:
+        while subscriber.active:
+            frame = subscriber.get(timeout=1.0)
+            if frame is None:
+                continue
+            # Shared header/body/trailer chunks: nothing is concatenated or copied per viewer
+            yield from frame.chunks()
+            # A viewer that keeps skipping frames is switched to a lower quality
+            subscriber.kind = quality.update(subscriber.skipped)
+    finally:
+        subscriber.close()
+
+def gen_placements(session):
+    """Newline-delimited JSON placement messages from the webcam, no compositing or JPEG encoding"""
+    while not startup.wait(1.0):
+        if startup.failed:
+            yield json.dumps({'error': f"Start-up failed: {startup.error}"}).encode() + b'\n'
+            return
+        yield b''
+    subscriber = subscribe_camera(session, 'placement')
+    try:
+        while subscriber.active:
+            message = subscriber.get(timeout=1.0)
+            if message is not None:
+                yield message
+    finally:
+        subscriber.close()
+
+def session_status(session):
+    """What the page shows about a session: shirt, fit metrics, cart, gesture, toggles and last photo"""
+    with session.lock:
+        return {
+            'camera_active': session.camera_active,
+            'current_shirt': session.image_number,
+            'fit_detection': session.fit_detection,
+            'tracking_quality': session.tracking_quality,
+            'total_shirts': len(catalog),
+            'cart_count': len(session.cart_items),
+            'cart': list(session.cart_items),
+            'cart_total': sum(item['price'] for item in session.cart_items),
+            'last_gesture': session.gesture_detected,
+            'last_gesture_time': session.last_gesture_time,
+            'shirt_overlay_active': session.shirt_overlay_active,
+            'show_landmarks': session.show_pose_landmarks,
+            'last_photo': session.last_captured_photo
+        }
+
+# Changes within one tick are sent as a single event
+STATUS_TICK = 0.2
+STATUS_KEEPALIVE = 15.0
+
+def gen_status_events(session):
+    """Wait for session changes and yield each tick's changed status fields as one SSE message"""
+    sent = {}
+    version = None
+    yield 'retry: 3000\n\n'
+    while True:
+        new_version = session.wait_for_change(version, timeout=STATUS_KEEPALIVE)
+        session.touch()
+        if new_version == version:
+            # Comment line: keeps proxies from closing the stream and detects gone clients
+            yield ': keepalive\n\n'
+            continue
+        if version is not None:
+            time.sleep(STATUS_TICK)
+        version = session.version
+        status = session_status(session)
+        diff = {key: value for key, value in status.items() if key not in sent or sent[key] != value}
+        sent = status
+        if diff:
+            yield f"data: {json.dumps(diff, separators=(',', ':'))}\n\n"
+
+def add_ui_overlays(image, current_time, session):
     """Add new UI overlays without affecting original functionality"""
-    if (app_state['gesture_detected'] and current_time - app_state['last_gesture_time'] < 1.5):
-        gesture_text = app_state['gesture_detected'].replace('_', ' ').title()
+    if (session.gesture_detected and current_time - session.last_gesture_time < 1.5):
+        gesture_text = session.gesture_detected.replace('_', ' ').title()
         cv2.putText(image, f"Gesture: {gesture_text}", (50, 50), 
                    cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 0), 2)
     
-    if len(listShirts) > 0:
-        shirt_info = f"Shirt {imageNumber + 1}/{len(listShirts)}"
+    if len(catalog) > 0:
+        shirt_info = f"Shirt {session.image_number + 1}/{len(catalog)}"
         cv2.putText(image, shirt_info, (50, image.shape[0] - 50), 
                    cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
     
-    if app_state['cart_items']:
-        cart_text = f"Cart: {len(app_state['cart_items'])} items"
+    if session.cart_items:
+        cart_text = f"Cart: {len(session.cart_items)} items"
         cv2.putText(image, cart_text, (image.shape[1] - 200, 50), 
                    cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 255), 2)
 
 # ROUTES
+@app.before_request
+def begin_startup():
+    # Under other WSGI servers the first request starts loading the models
+    startup.start()
+
+@app.route('/healthz')
+def healthz():
+    """Liveness: the server answers, whether or not the models are loaded yet"""
+    return jsonify({'status': 'ok', 'uptime': startup.report()['uptime']})
+
+@app.route('/readyz')
+def readyz():
+    """Readiness: 200 once the models are loaded and warmed, 503 before; lists how long each start-up step took"""
+    report = startup.report()
+    return jsonify(report), 200 if report['status'] == 'ready' else 503
+
+@app.route('/api/startup/retry', methods=['POST'])
+def retry_startup():
+    """Resume a failed start-up from the step that failed (409 unless it had failed)"""
+    started = startup.retry()
+    return jsonify(startup.report()), 202 if started else 409
+
 @app.route('/')
 def index():
+    session = current_session()
     inventory = get_shirt_inventory()
     return render_template('index.html', 
                          shirts=inventory,
-                         current_shirt=imageNumber,
-                         shirt_count=len(listShirts),
-                         cart_count=len(app_state['cart_items']))
+                         current_shirt=session.image_number,
+                         shirt_count=len(catalog),
+                         cart_count=len(session.cart_items),
+                         session_id=session.session_id)
 
 @app.route('/video_feed')
 def video_feed():
-    return Response(gen_frames(), mimetype='multipart/x-mixed-replace; boundary=frame')
+    """MJPEG (or ?format=webp) stream; ?quality=10-100 and ?width= set the encoding"""
+    try:
+        profile = EncodingProfile.from_args(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return Response(gen_frames(current_session(), profile), mimetype='multipart/x-mixed-replace; boundary=frame')
+
+@app.route('/placement_feed')
+def placement_feed():
+    return Response(gen_placements(current_session()), mimetype='application/x-ndjson')
+
+@app.route('/api/frames', methods=['POST'])
+def process_frames():
+    """Run client frames through the try-on pipeline.
+    
+    The body is one JPEG/WebP image, or a multipart form with several 'frame'
+    files. ?mode=composite (default) returns the composited JPEG (JSON with
+    base64 frames for a batch), ?mode=placement returns only the placement.
+    Frames are mirrored like the webcam unless ?mirror=0.
+    """
+    session = current_session()
+    mode = request.args.get('mode', 'composite')
+    if mode not in ('composite', 'placement'):
+        return jsonify({'error': 'Unknown mode'}), 400
+    frames = [f.read() for f in request.files.getlist('frame')] or [request.get_data()]
+    if not all(frames):
+        return jsonify({'error': 'No frame data'}), 400
+    
+    def handle(image, results):
+        if mode == 'placement':
+            return placement_message(update_session(session, results, image.shape[1], image.shape[0]), image)
+        return encode_frame(render_frame(session, image, results))
+    
+    try:
+        future = upload_service.submit(session.session_id, frames, handle,
+                                       mirror=request.args.get('mirror', '1') != '0')
+    except StreamBusy as e:
+        response = jsonify({'error': str(e)})
+        response.headers['Retry-After'] = '1'
+        return response, 429
+    try:
+        outputs = future.result()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    if mode == 'placement':
+        return jsonify(outputs[0] if len(outputs) == 1 else {'frames': outputs})
+    if len(outputs) == 1:
+        return Response(outputs[0], mimetype='image/jpeg')
+    return jsonify({'frames': [base64.b64encode(frame).decode('ascii') for frame in outputs]})
 
 @app.route('/api/inventory')
 def get_inventory():
-    return jsonify(get_shirt_inventory())
+    """Shirt inventory as a JSON list, optionally filtered by ?brand=, ?min_price=, ?max_price=
+    and paged with ?offset= and ?limit= (X-Total-Count holds the number of matches)
+    """
+    brand = request.args.get('brand')
+    min_price = request.args.get('min_price', type=float)
+    max_price = request.args.get('max_price', type=float)
+    offset = max(0, request.args.get('offset', 0, type=int))
+    limit = request.args.get('limit', type=int)
+    if limit is not None and limit < 1:
+        return jsonify({'error': 'limit must be positive'}), 400
+    query = (brand.lower() if brand else None, min_price, max_price, offset, limit)
+    catalog.refresh()
+    etag = f"{catalog.etag}-{hashlib.sha1(repr(query).encode()).hexdigest()[:8]}"
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        total, items = catalog.query(brand, min_price, max_price, offset, limit)
+        response = jsonify(items)
+        response.headers['X-Total-Count'] = str(total)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+@app.route('/api/lookbook', methods=['POST'])
+def lookbook():
+    """Render one photo with every garment (or those matching ?brand=, ?min_price=, ?max_price=).
+    
+    The photo is the request body or a multipart 'photo' file, or ?photo=<name>
+    from the captured photos. ?format=sheet (default) returns a JPEG contact
+    sheet, ?format=zip a zip of full-size composites. ?mirror=1 mirrors the
+    photo like the live view first.
+    """
+    fmt = request.args.get('format', 'sheet')
+    if fmt not in ('sheet', 'zip'):
+        return jsonify({'error': 'Unknown format'}), 400
+    if 'photo' in request.args:
+        photo = cv2.imread(os.path.join(captured_photos_dir, os.path.basename(request.args['photo'])))
+    else:
+        upload = request.files.get('photo')
+        data = upload.read() if upload is not None else request.get_data()
+        photo = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR) if data else None
+    if photo is None:
+        return jsonify({'error': 'No readable photo'}), 400
+    if request.args.get('mirror') == '1':
+        photo = cv2.flip(photo, 1)
+    
+    total, items = catalog.query(request.args.get('brand'),
+                                 request.args.get('min_price', type=float),
+                                 request.args.get('max_price', type=float))
+    if not items:
+        return jsonify({'error': 'No garments match'}), 404
+    if fmt == 'sheet' and total > 400:
+        return jsonify({'error': f'{total} garments are too many for one sheet, use format=zip or a filter'}), 400
+    
+    pose = detect_pose(photo)
+    box = shirt_box_for_pose(pose, photo.shape[1], photo.shape[0]) if pose is not None else None
+    if box is None:
+        return jsonify({'error': 'No person found in the photo'}), 422
+    
+    data = render_lookbook(photo, box, lookbook_garments(items), shirtFolderPath, mode=fmt)
+    if fmt == 'zip':
+        return send_file(io.BytesIO(data), mimetype='application/zip', as_attachment=True, download_name='lookbook.zip')
+    return Response(data, mimetype='image/jpeg')
 
 @app.route('/api/current_shirt')
 def get_current_shirt():
-    if len(listShirts) > 0:
+    session = current_session()
+    shirt_info = catalog.get(session.image_number)
+    if shirt_info is not None:
         return jsonify({
-            'id': imageNumber,
-            'name': listShirts[imageNumber],
-            'total_shirts': len(listShirts)
+            'id': shirt_info['id'],
+            'position': session.image_number,
+            'name': shirt_info['filename'],
+            'total_shirts': len(catalog)
         })
     return jsonify({'error': 'No shirts available'})
 
 @app.route('/api/select_shirt', methods=['POST'])
 def select_shirt():
-    global imageNumber
+    session = current_session()
     data = request.get_json()
-    shirt_id = data.get('shirt_id', 0)
+    position = catalog.position(data.get('shirt_id'))
     
-    if 0 <= shirt_id < len(listShirts):
-        imageNumber = shirt_id
-        return jsonify({'success': True, 'current_shirt': shirt_id})
+    if position is not None:
+        with session.lock:
+            session.image_number = position
+            session.mark_changed()
+        return jsonify({'success': True, 'current_shirt': position})
     return jsonify({'error': 'Invalid shirt ID'})
 
 @app.route('/api/next_shirt', methods=['POST'])
 def next_shirt():
-    global imageNumber
-    if len(listShirts) > 0:
-        imageNumber = (imageNumber + 1) % len(listShirts)
-        return jsonify({'success': True, 'current_shirt': imageNumber})
+    session = current_session()
+    if len(catalog) > 0:
+        with session.lock:
+            session.image_number = (session.image_number + 1) % len(catalog)
+            session.mark_changed()
+        return jsonify({'success': True, 'current_shirt': session.image_number})
     return jsonify({'error': 'No shirts available'})
 
 @app.route('/api/previous_shirt', methods=['POST'])
 def previous_shirt():
-    global imageNumber
-    if len(listShirts) > 0:
-        imageNumber = (imageNumber - 1) % len(listShirts)
-        return jsonify({'success': True, 'current_shirt': imageNumber})
+    session = current_session()
+    if len(catalog) > 0:
+        with session.lock:
+            session.image_number = (session.image_number - 1) % len(catalog)
+            session.mark_changed()
+        return jsonify({'success': True, 'current_shirt': session.image_number})
     return jsonify({'error': 'No shirts available'})
 
 @app.route('/api/cart', methods=['GET'])
 def get_cart():
+    session = current_session()
     return jsonify({
-        'items': app_state['cart_items'],
-        'count': len(app_state['cart_items']),
-        'total': sum(item['price'] for item in app_state['cart_items'])
+        'items': session.cart_items,
+        'count': len(session.cart_items),
+        'total': sum(item['price'] for item in session.cart_items)
     })
 
 @app.route('/api/cart/add', methods=['POST'])
 def add_to_cart():
+    session = current_session()
     data = request.get_json()
-    shirt_id = data.get('shirt_id', imageNumber)
+    shirt_id = data.get('shirt_id')
     
-    if 0 <= shirt_id < len(listShirts):
-        inventory = get_shirt_inventory()
-        shirt_info = inventory[shirt_id]
-        
-        if not any(item['id'] == shirt_id for item in app_state['cart_items']):
-            app_state['cart_items'].append({
-                'id': shirt_info['id'],
-                'name': shirt_info['name'],
-                'price': shirt_info['price'],
-                'filename': shirt_info['filename'],
-                'brand': shirt_info['brand'],
-                'added_time': datetime.now().isoformat()
-            })
-            return jsonify({'success': True, 'cart_count': len(app_state['cart_items'])})
-        else:
-            return jsonify({'error': 'Item already in cart'})
+    shirt_info = catalog.get(session.image_number) if shirt_id is None else catalog.by_id(shirt_id)
+    if shirt_info is not None:
+        with session.lock:
+            if not any(item['id'] == shirt_info['id'] for item in session.cart_items):
+                session.cart_items.append({
+                    'id': shirt_info['id'],
+                    'name': shirt_info['name'],
+                    'price': shirt_info['price'],
+                    'filename': shirt_info['filename'],
+                    'brand': shirt_info['brand'],
+                    'added_time': datetime.now().isoformat()
+                })
+                session.mark_changed()
+                return jsonify({'success': True, 'cart_count': len(session.cart_items)})
+            else:
+                return jsonify({'error': 'Item already in cart'})
     
     return jsonify({'error': 'Invalid shirt ID'})
 
 @app.route('/api/cart/remove', methods=['POST'])
 def remove_from_cart():
+    session = current_session()
     data = request.get_json()
     item_id = data.get('item_id')
     
-    app_state['cart_items'] = [item for item in app_state['cart_items'] if item['id'] != item_id]
-    return jsonify({'success': True, 'cart_count': len(app_state['cart_items'])})
+    with session.lock:
+        session.cart_items = [item for item in session.cart_items if item['id'] != item_id]
+        session.mark_changed()
+    return jsonify({'success': True, 'cart_count': len(session.cart_items)})
 
 @app.route('/api/cart/clear', methods=['POST'])
 def clear_cart():
-    app_state['cart_items'] = []
+    session = current_session()
+    with session.lock:
+        session.cart_items = []
+        session.mark_changed()
     return jsonify({'success': True, 'cart_count': 0})
 
 @app.route('/api/status')
 def get_status():
-    return jsonify({
-        'camera_active': app_state['camera_active'],
-        'current_shirt': imageNumber,
-        'fit_detection': app_state['fit_detection'],
-        'tracking_quality': app_state['tracking_quality'],
-        'total_shirts': len(listShirts),
-        'cart_count': len(app_state['cart_items']),
-        'last_gesture': app_state['gesture_detected'],
-        'shirt_overlay_active': app_state['shirt_overlay_active']
-    })
+    session = current_session()
+    return jsonify(dict(session_status(session), **{
+        'stream': camera_broadcaster.stats(),
+        'inference': camera_inference.stats() if camera_inference is not None else None,
+        'idle': camera_idle.stats(),
+        'inference_workers': inference_pool.stats() if inference_pool is not None else None,
+        'uploads': upload_service.stats(),
+        'photos': photo_capture.stats(),
+        'gallery': photo_gallery.stats(),
+        'timings': metrics.stage_summary(),
+        'active_sessions': len(sessions)
+    }))
+
+@app.route('/api/status/stream')
+def status_stream():
+    """Server-sent events: the full session status first, then only the fields that changed"""
+    response = Response(gen_status_events(current_session()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Stage timing histograms, FPS, dropped frames and stream counts in Prometheus text format"""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/profiler', methods=['GET', 'POST'])
+def sampling_profiler():
+    """POST {"enabled": true|false} toggles the sampling profiler; GET returns collapsed stacks"""
+    if request.method == 'POST':
+        data = request.get_json(silent=True) or {}
+        if data.get('enabled', not profiler.running):
+            profiler.start()
+        else:
+            profiler.stop()
+        return jsonify({'enabled': profiler.running, 'samples': sum(profiler.samples.values())})
+    return Response(profiler.report(request.args.get('limit', type=int)), mimetype='text/plain')
 
 @app.route('/api/toggle_landmarks', methods=['POST'])
 def toggle_landmarks():
-    app_state['show_pose_landmarks'] = not app_state['show_pose_landmarks']
-    return jsonify({'show_landmarks': app_state['show_pose_landmarks']})
+    session = current_session()
+    with session.lock:
+        session.show_pose_landmarks = not session.show_pose_landmarks
+        session.mark_changed()
+    return jsonify({'show_landmarks': session.show_pose_landmarks})
 
 # Photo capture routes
+def capture_response(job, wait):
+    """The job's state once it is done or ``wait`` seconds have passed (202 while pending)"""
+    wait_for_futures([job.future], timeout=min(max(wait, 0.0), 30.0))
+    state = job.as_dict()
+    if state['status'] == 'ready':
+        return jsonify(dict(state, success=True,
+                            download_url=url_for('download_photo', capture_id=job.capture_id)))
+    if state['status'] == 'failed':
+        # 409: nothing renders the session, 503: no frame came in time, 500: the photo could not be written
+        error = job.future.exception()
+        code = 409 if isinstance(error, CaptureUnavailable) else 503 if isinstance(error, TimeoutError) else 500
+        return jsonify(dict(state, success=False)), code
+    return jsonify(dict(state, success=True, message='Photo capture initiated',
+                        poll_url=url_for('capture_photo_status', capture_id=job.capture_id))), 202
+
 @app.route('/api/capture_photo', methods=['POST'])
 def capture_photo():
+    """Capture the next rendered frame; answers with the filename once written, waiting up to ?wait=2 seconds"""
     try:
-        app_state['capture_requested'] = True
-        # Wait a moment for the frame to be captured
-        time.sleep(0.5)
-        return jsonify({'success': True, 'message': 'Photo capture initiated'})
+        session = current_session()
+        job = request_photo(session)
+        return capture_response(job, request.args.get('wait', 2.0, type=float))
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
 
+@app.route('/api/capture_photo/<capture_id>')
+def capture_photo_status(capture_id):
+    """Long-poll a capture: returns as soon as the photo is written or after ?wait=10 seconds"""
+    session = current_session()
+    job = photo_capture.get(capture_id)
+    if job is None or job.session_id != session.session_id:
+        return jsonify({'success': False, 'error': 'Unknown capture'}), 404
+    return capture_response(job, request.args.get('wait', 10.0, type=float))
+
+# Saved photos never change, so clients and proxies may cache them for a day;
+# send_file answers If-None-Match/If-Modified-Since and Range requests itself
+PHOTO_MAX_AGE = 24 * 3600
+
+def send_photo(filename, as_attachment=True):
+    """Stream a captured photo with conditional and Range support"""
+    return send_file(photo_gallery.path(filename), as_attachment=as_attachment, download_name=filename,
+                     conditional=True, max_age=PHOTO_MAX_AGE)
+
 @app.route('/api/download_photo')
 def download_photo():
+    """Download the session's latest photo, or the one from ?capture_id="""
+    session = current_session()
     try:
-        if app_state['last_captured_photo'] and os.path.exists(os.path.join(captured_photos_dir, app_state['last_captured_photo'])):
-            filepath = os.path.join(captured_photos_dir, app_state['last_captured_photo'])
-            return send_file(filepath, as_attachment=True, download_name=app_state['last_captured_photo'])
+        filename = session.last_captured_photo
+        capture_id = request.args.get('capture_id')
+        if capture_id:
+            job = photo_capture.get(capture_id)
+            state = job.as_dict() if job is not None and job.session_id == session.session_id else {}
+            filename = state.get('filename')
+        if filename and os.path.exists(photo_gallery.path(filename)):
+            return send_photo(filename)
         else:
             return jsonify({'error': 'No photo available'}), 404
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+# The photo gallery is the kiosk's, not a session's: every visitor sees every
+# photo, as they could already under /static/captured_photos. Only
+# /api/download_photo and capture polling are tied to the session.
+@app.route('/api/photos')
+def list_photos():
+    """Captured photos, newest first, paged with ?offset= and ?limit= (X-Total-Count holds the total);
+    ?mine=1 lists only this session's photos
+    """
+    offset = max(0, request.args.get('offset', 0, type=int))
+    limit = request.args.get('limit', 50, type=int)
+    if not 1 <= limit <= 500:
+        return jsonify({'error': 'limit must be between 1 and 500'}), 400
+    session_id = current_session().session_id if request.args.get('mine') == '1' else None
+    total, photos = photo_gallery.list(session_id, offset, limit)
+    for photo in photos:
+        photo['url'] = url_for('get_photo', filename=photo['filename'])
+        photo['thumbnail_url'] = url_for('get_photo_thumbnail', filename=photo['filename'])
+        photo['created'] = datetime.fromtimestamp(photo['created']).isoformat()
+    response = jsonify(photos)
+    response.headers['X-Total-Count'] = str(total)
+    return response
+
+@app.route('/api/photos/<filename>')
+def get_photo(filename):
+    """One captured photo, shown inline unless ?download=1"""
+    if photo_gallery.get(filename) is None:
+        return jsonify({'error': 'Unknown photo'}), 404
+    return send_photo(filename, as_attachment=request.args.get('download') == '1')
+
+@app.route('/api/photos/<filename>/thumbnail')
+def get_photo_thumbnail(filename):
+    if photo_gallery.get(filename) is None:
+        return jsonify({'error': 'Unknown photo'}), 404
+    path = photo_gallery.thumbnail_path(filename)
+    if path is None:
+        return jsonify({'error': 'No thumbnail available'}), 404
+    return send_file(path, conditional=True, max_age=PHOTO_MAX_AGE)
+
 @app.route('/api/toggle_overlay', methods=['POST'])
 def toggle_overlay():
-    app_state['shirt_overlay_active'] = not app_state['shirt_overlay_active']
-    return jsonify({'overlay_active': app_state['shirt_overlay_active']})
+    session = current_session()
+    with session.lock:
+        session.shirt_overlay_active = not session.shirt_overlay_active
+        session.mark_changed()
+    return jsonify({'overlay_active': session.shirt_overlay_active})
 
 if __name__ == '__main__':
     os.makedirs(shirtFolderPath, exist_ok=True)
     os.makedirs(captured_photos_dir, exist_ok=True)
-    print(f"Found {len(listShirts)} shirts in {shirtFolderPath}")
+    startup.start()
     print(f"Photos will be saved to {captured_photos_dir}")
-    app.run(debug=True, threaded=True)
+    # The reloader imports everything twice (and restarts the models on every edit),
+    # so it is only used when asked for with TRYON_RELOAD=1
+    app.run(debug=os.environ.get('TRYON_DEBUG', '1') == '1', threaded=True,
+            use_reloader=os.environ.get('TRYON_RELOAD') == '1')
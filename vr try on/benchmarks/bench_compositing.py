@@ -0,0 +1,68 @@
+"""Micro-benchmark: cached fixed-point compositing vs the original overlay_image_alpha.
+
+Run from the ``vr try on`` directory:
+
+    python benchmarks/bench_compositing.py [--iterations 200] [--shirt green.png]
+"""
+import argparse
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import overlay_image_alpha, shirtFolderPath, fixedRatio, shirtRatioHeightWidth  # noqa: E402
+from compositing import composite  # noqa: E402
+from garment_cache import GarmentCache  # noqa: E402
+
+RESOLUTIONS = [('480p', 640, 480), ('720p', 1280, 720), ('1080p', 1920, 1080)]
+
+
+def time_per_call(fn, iterations):
+    fn()
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1000.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--shirt', default=None, help='garment file in static/Shirts (default: first one)')
+    args = parser.parse_args()
+
+    names = sorted(os.listdir(shirtFolderPath))
+    shirt = args.shirt or names[0]
+    raw = cv2.imread(os.path.join(shirtFolderPath, shirt), cv2.IMREAD_UNCHANGED)
+    cache = GarmentCache(shirtFolderPath)
+
+    print(f"garment: {shirt}, {args.iterations} iterations, ms per frame")
+    print(f"{'frame':>6} {'garment':>10} {'legacy':>8} {'cached':>8} {'speedup':>8}")
+    rng = np.random.default_rng(0)
+    for label, width, height in RESOLUTIONS:
+        frame = rng.integers(0, 256, (height, width, 3), dtype=np.uint8)
+        # Shoulders roughly a quarter of the frame apart, as in a typical kiosk framing
+        shirt_width = int(width * 0.25 * fixedRatio)
+        shirt_height = int(shirt_width * shirtRatioHeightWidth)
+        x, y = (width - shirt_width) // 2, height // 5
+        prepared = cache.get(shirt, shirt_width, shirt_height)
+
+        def legacy():
+            resized = cv2.resize(raw, (shirt_width, shirt_height))
+            overlay_image_alpha(frame, resized, x, y)
+
+        def cached():
+            composite(frame, cache.get(shirt, shirt_width, shirt_height), x, y)
+
+        legacy_ms = time_per_call(legacy, args.iterations)
+        cached_ms = time_per_call(cached, args.iterations)
+        size = f"{prepared.width}x{prepared.height}"
+        print(f"{label:>6} {size:>10} {legacy_ms:8.2f} {cached_ms:8.2f} {legacy_ms / cached_ms:7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
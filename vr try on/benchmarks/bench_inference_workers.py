@@ -0,0 +1,94 @@
+"""Aggregate inference throughput for several simultaneous streams, in-process versus worker processes.
+
+Run from the ``vr try on`` directory:
+
+    python benchmarks/bench_inference_workers.py clip.mp4 --streams 1,4,8 --workers 0,2,4,8
+
+Each stream is a thread feeding frames of the source to its own engine as
+fast as it can, like one camera installation. ``--workers 0`` runs every
+engine in this process (the default setup); otherwise engines run in an
+InferenceWorkerPool of that many processes.
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+import cv2
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from frame_sources import open_source  # noqa: E402
+from inference import create_engine  # noqa: E402
+from inference_workers import InferenceWorkerPool  # noqa: E402
+
+OPTIONS = dict(pose_every=1, hands_every=3, region_mode='crop', max_side=640)
+
+
+def load_frames(spec, count, width):
+    source = open_source(spec, loop=True)
+    frames = []
+    for _ in range(count):
+        frame = source.read()
+        if frame is None:
+            break
+        if width and frame.shape[1] != width:
+            frame = cv2.resize(frame, (width, round(frame.shape[0] * width / frame.shape[1])))
+        frames.append(cv2.flip(frame, 1))
+    source.release()
+    return frames
+
+
+def run(frames, streams, workers, seconds):
+    pool = InferenceWorkerPool(create_engine, workers=workers, engine_options=OPTIONS) if workers else None
+    engines = [pool.engine() if pool else create_engine(**OPTIONS) for _ in range(streams)]
+    # Warm up: model loading is not part of the measurement
+    for engine in engines:
+        engine(frames[0])
+    counts = [0] * streams
+    stop = threading.Event()
+
+    def feed(index):
+        engine = engines[index]
+        while not stop.is_set():
+            engine(frames[counts[index] % len(frames)])
+            counts[index] += 1
+
+    threads = [threading.Thread(target=feed, args=(i,), daemon=True) for i in range(streams)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    for engine in engines:
+        engine.close()
+    if pool:
+        pool.close()
+    total = sum(counts)
+    return total / elapsed, min(counts) / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('source', nargs='?', default='synthetic:1280x720')
+    parser.add_argument('--streams', default='1,2,4')
+    parser.add_argument('--workers', default='0,2')
+    parser.add_argument('--seconds', type=float, default=10.0)
+    parser.add_argument('--width', type=int, default=1280)
+    args = parser.parse_args()
+
+    frames = load_frames(args.source, 120, args.width)
+    print(f"{os.cpu_count()} CPUs, {len(frames)} frames of {frames[0].shape[1]}x{frames[0].shape[0]}")
+    for workers in (int(n) for n in args.workers.split(',')):
+        for streams in (int(n) for n in args.streams.split(',')):
+            total_fps, slowest_fps = run(frames, streams, workers, args.seconds)
+            label = f"{workers} workers" if workers else "in-process"
+            print(f"{label:>12}, {streams} streams: {total_fps:6.1f} fps total, slowest stream {slowest_fps:5.1f} fps")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,144 @@
+"""Per-frame cost, jitter and lag of the shoulder smoothing filters.
+
+Run from the ``vr try on`` directory:
+
+    python benchmarks/bench_smoothing.py                      # synthetic trace with known ground truth
+    python benchmarks/bench_smoothing.py --record clip.mp4 --trace clip_trace.npz
+    python benchmarks/bench_smoothing.py --trace clip_trace.npz
+
+``--record`` runs the pose model over a video and saves the landmark trace
+(pose arrays and timestamps) so filters can be compared on real movement.
+Jitter is the RMS frame-to-frame acceleration of the output in pixels,
+lag the shift in frames that best aligns the output with the reference
+(ground truth for the synthetic trace, the raw landmarks for recordings).
+"""
+import argparse
+import os
+import sys
+import time
+from collections import deque
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from landmark_filter import LandmarkTracker, PLACEMENT_LANDMARKS  # noqa: E402
+from landmarks import LEFT_SHOULDER, RIGHT_SHOULDER  # noqa: E402
+
+WIDTH, HEIGHT, FPS = 1280, 720, 30.0
+
+
+def synthetic_trace(seconds=20, noise_px=2.0, seed=0):
+    """Slow sway, still periods and fast side steps, plus detector noise; returns (poses, times, truth)"""
+    rng = np.random.default_rng(seed)
+    times = np.arange(int(seconds * FPS)) / FPS
+    x = 0.5 + 0.03 * np.sin(2 * np.pi * 0.4 * times)
+    # A quick 15% step to the side every 5 seconds, over 0.2s
+    for start in np.arange(2.5, seconds, 5.0):
+        x += 0.15 * np.clip((times - start) / 0.2, 0, 1) * (1 if int(start) % 2 else -1)
+    poses = np.zeros((len(times), 33, 4), dtype=np.float32)
+    poses[:, :, 3] = 1
+    truth = np.zeros((len(times), 2, 2))
+    for row, index, offset in ((0, LEFT_SHOULDER, 0.08), (1, RIGHT_SHOULDER, -0.08)):
+        truth[:, row, 0] = (x + offset) * WIDTH
+        truth[:, row, 1] = 0.35 * HEIGHT
+    noisy = truth + rng.normal(0, noise_px, truth.shape)
+    for row, index in ((0, LEFT_SHOULDER), (1, RIGHT_SHOULDER)):
+        poses[:, index, 0] = noisy[:, row, 0] / WIDTH
+        poses[:, index, 1] = noisy[:, row, 1] / HEIGHT
+    return poses, times, truth
+
+
+def record_trace(video, output):
+    """Run the app's inference engine over a video and save the pose trace"""
+    import cv2
+    import app
+    engine = app.create_inference_engine()
+    cap = cv2.VideoCapture(video)
+    fps = cap.get(cv2.CAP_PROP_FPS) or FPS
+    poses, times, index = [], [], 0
+    while True:
+        success, frame = cap.read()
+        if not success:
+            break
+        results = engine(cv2.flip(frame, 1))
+        if results.pose is not None:
+            poses.append(results.pose)
+            times.append(index / fps)
+        index += 1
+    cap.release()
+    engine.close()
+    np.savez_compressed(output, pose=np.array(poses, dtype=np.float32), t=np.array(times))
+    print(f"Recorded {len(poses)} poses from {index} frames to {output}")
+
+
+class LegacySmoother:
+    """The original deque of pixel tuples averaged with np.mean, for comparison"""
+
+    def __init__(self):
+        self.buffer = deque(maxlen=5)
+
+    def update(self, pose, width, height, t):
+        lm11, lm12 = pose[LEFT_SHOULDER], pose[RIGHT_SHOULDER]
+        self.buffer.append(((int(lm11[0] * width), int(lm11[1] * height)),
+                            (int(lm12[0] * width), int(lm12[1] * height))))
+        avg_lm11 = tuple(int(v) for v in np.mean([p[0] for p in self.buffer], axis=0))
+        avg_lm12 = tuple(int(v) for v in np.mean([p[1] for p in self.buffer], axis=0))
+        return np.array([avg_lm11, avg_lm12], dtype=float)
+
+
+def run(smoother, poses, times):
+    outputs = np.zeros((len(poses), 2, 2))
+    start = time.perf_counter()
+    for i in range(len(poses)):
+        outputs[i] = smoother.update(poses[i], WIDTH, HEIGHT, times[i])[:2]
+    return outputs, (time.perf_counter() - start) / len(poses)
+
+
+def lag_frames(output, reference, max_lag=15):
+    errors = [np.mean((output[k:] - reference[:len(reference) - k]) ** 2) for k in range(max_lag + 1)]
+    return int(np.argmin(errors))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--trace', help='.npz landmark trace (pose, t) to evaluate, or to write with --record')
+    parser.add_argument('--record', metavar='VIDEO', help='record a trace from this video first')
+    parser.add_argument('--repeat', type=int, default=5, help='timing repetitions (best is reported)')
+    args = parser.parse_args()
+
+    if args.record:
+        if not args.trace:
+            parser.error('--record needs --trace to write to')
+        record_trace(args.record, args.trace)
+    if args.trace:
+        data = np.load(args.trace)
+        poses, times, truth = data['pose'], data['t'], None
+        if len(poses) < 3:
+            parser.error(f"{args.trace} holds too few poses to evaluate")
+        reference = poses[:, [LEFT_SHOULDER, RIGHT_SHOULDER], :2] * (WIDTH, HEIGHT)
+    else:
+        poses, times, truth = synthetic_trace()
+        reference = truth
+
+    smoothers = {
+        'legacy': LegacySmoother,
+        'average': lambda: LandmarkTracker(PLACEMENT_LANDMARKS, mode='average'),
+        'one_euro': lambda: LandmarkTracker(PLACEMENT_LANDMARKS, mode='one_euro'),
+        'kalman': lambda: LandmarkTracker(PLACEMENT_LANDMARKS, mode='kalman'),
+    }
+    raw = poses[:, [LEFT_SHOULDER, RIGHT_SHOULDER], :2] * (WIDTH, HEIGHT)
+    print(f"{len(poses)} frames, raw jitter {np.sqrt(np.mean(np.diff(raw, 2, axis=0) ** 2)):.2f}px")
+    print(f"{'filter':<10}{'us/frame':>10}{'jitter px':>11}{'lag frames':>12}" + ('' if truth is None else f"{'rmse px':>9}"))
+    for name, create in smoothers.items():
+        cost = min(run(create(), poses, times)[1] for _ in range(args.repeat))
+        outputs, _ = run(create(), poses, times)
+        jitter = np.sqrt(np.mean(np.diff(outputs, 2, axis=0) ** 2))
+        line = f"{name:<10}{cost * 1e6:>10.1f}{jitter:>11.2f}{lag_frames(outputs, reference):>12}"
+        if truth is not None:
+            line += f"{np.sqrt(np.mean((outputs - truth) ** 2)):>9.2f}"
+        print(line)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,169 @@
+"""Replay recorded footage through the try-on frame pipeline and report per-stage cost.
+
+Run from the ``vr try on`` directory; no webcam is needed:
+
+    python benchmarks/replay.py clip.mp4 frames_dir/ synthetic \\
+        --resolutions 480p,720p,1080p --garments 1,7 --frames 300 --output results.json
+
+Each source is replayed at every resolution and garment count (garments are
+cycled every frame so the asset cache sees them all). Stages are timed
+separately: capture, inference, placement, compose (garment + overlays) and
+encode. Results are printed and, with --output, written as JSON so runs
+before and after a change can be compared.
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import sys
+import time
+from datetime import datetime
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app  # noqa: E402
+from frame_sources import open_source  # noqa: E402
+from inference_scheduler import InferenceResult  # noqa: E402
+from landmarks import LEFT_SHOULDER, RIGHT_SHOULDER  # noqa: E402
+
+RESOLUTIONS = {'480p': (640, 480), '720p': (1280, 720), '1080p': (1920, 1080)}
+STAGES = ('capture', 'inference', 'placement', 'compose', 'encode')
+
+
+def synthetic_pose(index):
+    """A swaying pair of shoulders for footage without a person in it"""
+    pose = np.zeros((33, 4), dtype=np.float32)
+    sway = 0.05 * np.sin(index / 20.0)
+    pose[LEFT_SHOULDER] = (0.62 + sway, 0.35, 0, 1)
+    pose[RIGHT_SHOULDER] = (0.38 + sway, 0.35, 0, 1)
+    return pose
+
+
+def legacy_draw(session, image, results, placement):
+    """The original per-frame path: read the PNG, resize it and blend with overlay_image_alpha"""
+    if placement is not None and placement['shirt'] is not None:
+        shirt = cv2.imread(os.path.join(app.shirtFolderPath, placement['shirt']), cv2.IMREAD_UNCHANGED)
+        if shirt is not None and placement['shirt_width'] > 0:
+            shirt = cv2.resize(shirt, (placement['shirt_width'], placement['shirt_height']))
+            x, y = placement['shirt_top_left']
+            app.overlay_image_alpha(image, shirt, max(0, x), max(0, y))
+    app.add_ui_overlays(image, time.time(), session)
+    return image
+
+
+def percentiles(samples):
+    if not samples:
+        return {}
+    values = np.array(samples) * 1000.0
+    return {
+        'count': len(samples),
+        'mean_ms': round(float(values.mean()), 3),
+        'p50_ms': round(float(np.percentile(values, 50)), 3),
+        'p95_ms': round(float(np.percentile(values, 95)), 3),
+        'p99_ms': round(float(np.percentile(values, 99)), 3),
+    }
+
+
+def replay(spec, resolution, garments, frames, overlay, fake_pose, quality):
+    width, height = RESOLUTIONS[resolution]
+    source = open_source(spec, loop=True)
+    engine = app.create_inference_engine()
+    session = app.sessions.get(f'bench-{resolution}-{garments}')
+    session.show_pose_landmarks = False
+    shirts = app.catalog.filenames()[:garments] or [None]
+    draw = legacy_draw if overlay == 'legacy' else app.draw_frame
+    timings = {stage: [] for stage in STAGES}
+    started = time.perf_counter()
+    processed = 0
+    for index in range(frames):
+        t0 = time.perf_counter()
+        frame = source.read()
+        if frame is None:
+            break
+        frame = cv2.flip(frame, 1)
+        t1 = time.perf_counter()
+        if frame.shape[1] != width or frame.shape[0] != height:
+            frame = cv2.resize(frame, (width, height))
+
+        t2 = time.perf_counter()
+        results = engine(frame)
+        if fake_pose and results.pose is None:
+            results = InferenceResult(synthetic_pose(index), results.hands, True, results.hands_fresh)
+        t3 = time.perf_counter()
+        session.image_number = index % len(shirts)
+        placement = app.update_session(session, results, width, height)
+        t4 = time.perf_counter()
+        image = draw(session, frame, results, placement)
+        t5 = time.perf_counter()
+        cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+        t6 = time.perf_counter()
+
+        timings['capture'].append(t1 - t0)
+        timings['inference'].append(t3 - t2)
+        timings['placement'].append(t4 - t3)
+        timings['compose'].append(t5 - t4)
+        timings['encode'].append(t6 - t5)
+        processed += 1
+    elapsed = time.perf_counter() - started
+    source.release()
+    engine.close()
+    return {
+        'source': spec,
+        'resolution': resolution,
+        'garments': len(shirts),
+        'overlay': overlay,
+        'frames': processed,
+        'throughput_fps': round(processed / elapsed, 2) if elapsed else 0.0,
+        'stages': {stage: percentiles(samples) for stage, samples in timings.items()},
+        'garment_cache': app.garment_cache.stats(),
+        # ru_maxrss is the process-wide peak so far (KiB on Linux)
+        'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('sources', nargs='*', default=['synthetic'],
+                        help='video files, image directories, synthetic[:WxH] or device:N')
+    parser.add_argument('--resolutions', default='480p,720p,1080p')
+    parser.add_argument('--garments', default='1', help='comma-separated garment counts to cycle through')
+    parser.add_argument('--frames', type=int, default=300)
+    parser.add_argument('--overlay', choices=['cached', 'legacy'], default='cached')
+    parser.add_argument('--quality', type=int, default=80)
+    parser.add_argument('--no-fake-pose', action='store_true',
+                        help='do not substitute a synthetic pose when the models find nobody')
+    parser.add_argument('--output', help='write results as JSON to this file')
+    args = parser.parse_args()
+
+    runs = []
+    for spec in args.sources:
+        for resolution in args.resolutions.split(','):
+            for garments in (int(n) for n in args.garments.split(',')):
+                run = replay(spec, resolution, garments, args.frames, args.overlay,
+                             not args.no_fake_pose, args.quality)
+                runs.append(run)
+                stages = '  '.join(f"{stage} {run['stages'][stage].get('p50_ms', 0):.1f}/"
+                                   f"{run['stages'][stage].get('p95_ms', 0):.1f}" for stage in STAGES)
+                print(f"{spec} {resolution} x{run['garments']}: {run['throughput_fps']} fps, "
+                      f"p50/p95 ms: {stages}, peak RSS {run['peak_rss_mb']} MB")
+
+    if args.output:
+        report = {
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'opencv': cv2.__version__,
+            'runs': runs,
+        }
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""Stream a recorded video to /api/frames as if it were a browser camera.
+
+Run from the ``vr try on`` directory while the app is serving:
+
+    python benchmarks/upload_client.py clip.mp4 [--url http://127.0.0.1:5000] [--mode placement]
+"""
+import argparse
+import json
+import time
+import urllib.error
+import urllib.request
+import uuid
+
+import cv2
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('video', help='video file standing in for the client camera')
+    parser.add_argument('--url', default='http://127.0.0.1:5000')
+    parser.add_argument('--mode', choices=['composite', 'placement'], default='composite')
+    parser.add_argument('--session', default=None, help='session id (default: a new one)')
+    parser.add_argument('--quality', type=int, default=80, help='JPEG quality of uploaded frames')
+    parser.add_argument('--max-frames', type=int, default=0)
+    args = parser.parse_args()
+
+    session = args.session or uuid.uuid4().hex
+    endpoint = f"{args.url}/api/frames?mode={args.mode}&session={session}"
+    cap = cv2.VideoCapture(args.video)
+    latencies, rejected, sent = [], 0, 0
+    started = time.perf_counter()
+    while not args.max_frames or sent < args.max_frames:
+        success, frame = cap.read()
+        if not success:
+            break
+        ok, encoded = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, args.quality])
+        request = urllib.request.Request(endpoint, data=encoded.tobytes(), headers={'Content-Type': 'image/jpeg'})
+        start = time.perf_counter()
+        try:
+            with urllib.request.urlopen(request) as response:
+                body = response.read()
+        except urllib.error.HTTPError as e:
+            if e.code != 429:
+                raise
+            # Backpressure: the server is busy, drop this frame like a live camera would
+            rejected += 1
+            time.sleep(float(e.headers.get('Retry-After', 1)) / 10)
+            continue
+        latencies.append((time.perf_counter() - start) * 1000)
+        sent += 1
+        if args.mode == 'placement' and sent == 1:
+            print(json.loads(body))
+    cap.release()
+
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    if latencies:
+        print(f"frames: {sent}, rejected: {rejected}, fps: {sent / elapsed:.1f}, "
+              f"latency ms p50: {latencies[len(latencies) // 2]:.1f}, "
+              f"p95: {latencies[int(len(latencies) * 0.95)]:.1f}")
+
+
+if __name__ == '__main__':
+    main()
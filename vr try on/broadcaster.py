@@ -0,0 +1,137 @@
+import threading
+from collections import deque
+
+
+class Subscriber:
+    """One viewer's ring buffer of encoded frames; a slow viewer skips frames"""
+
+    def __init__(self, broadcaster, kind, buffer_size=2):
+        self._broadcaster = broadcaster
+        self.kind = kind
+        self._frames = deque(maxlen=buffer_size)
+        self._cond = threading.Condition()
+        self.active = True
+        self.delivered = 0
+        self.skipped = 0
+
+    def push(self, payload):
+        with self._cond:
+            if len(self._frames) == self._frames.maxlen:
+                self.skipped += 1
+                self._broadcaster.skipped += 1
+            self._frames.append(payload)
+            self._cond.notify()
+
+    def get(self, timeout=None):
+        """Return the oldest buffered frame, or None on timeout or once closed"""
+        with self._cond:
+            if not self._frames and self.active:
+                self._cond.wait(timeout)
+            if not self._frames:
+                return None
+            self.delivered += 1
+            return self._frames.popleft()
+
+    def end(self):
+        """Wake the viewer and let it drain; no more frames will arrive"""
+        with self._cond:
+            self.active = False
+            self._cond.notify_all()
+
+    def close(self):
+        self.end()
+        self._broadcaster.unsubscribe(self)
+
+    def stats(self):
+        return {'kind': str(self.kind), 'buffered': len(self._frames), 'delivered': self.delivered, 'skipped': self.skipped}
+
+
+class FrameBroadcaster:
+    """Runs a single frame pipeline and fans its output out to every subscriber.
+
+    ``start_pipeline(sink)`` must return a started pipeline that calls
+    ``sink(payload)`` for each frame and ``sink(None)`` when it ends. A
+    payload maps output kinds (an encoding profile, ``'placement'``) to data and
+    each subscriber receives the kind it subscribed to; the pipeline can ask
+    ``wants(kind)`` to skip producing outputs nobody is watching. It is
+    started with the first subscriber and stopped when the last one leaves.
+    """
+
+    def __init__(self, start_pipeline, buffer_size=2):
+        self._start_pipeline = start_pipeline
+        self._buffer_size = buffer_size
+        self._subscribers = []
+        self._lock = threading.Lock()
+        self.pipeline = None
+        self._generation = 0
+        self.published = 0
+        self.skipped = 0
+
+    def subscribe(self, kind):
+        subscriber = Subscriber(self, kind, self._buffer_size)
+        with self._lock:
+            self._subscribers.append(subscriber)
+            if self.pipeline is None or not self.pipeline.running:
+                self.pipeline = self._start_pipeline(self._sink_for_generation())
+        return subscriber
+
+    def _sink_for_generation(self):
+        # A stopped pipeline may still flush a frame or its end marker while
+        # its replacement is starting; only the current one may publish.
+        self._generation += 1
+        generation = self._generation
+
+        def sink(payload):
+            if generation == self._generation:
+                self.publish(payload)
+        return sink
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            if subscriber in self._subscribers:
+                self._subscribers.remove(subscriber)
+            pipeline = self.pipeline if not self._subscribers else None
+            if pipeline is not None:
+                self.pipeline = None
+                self._generation += 1
+        if pipeline is not None:
+            pipeline.stop()
+
+    def publish(self, payload):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        if payload is None:
+            for subscriber in subscribers:
+                subscriber.end()
+            return
+        self.published += 1
+        for subscriber in subscribers:
+            output = payload.get(subscriber.kind)
+            if output is not None:
+                subscriber.push(output)
+
+    def wants(self, kind):
+        """True if any current subscriber takes this kind of output"""
+        return kind in self.kinds()
+
+    def kinds(self):
+        """Every output kind some subscriber currently wants"""
+        with self._lock:
+            return {subscriber.kind for subscriber in self._subscribers}
+
+    def subscriber_kinds(self):
+        """The kind of every current subscriber, one entry each"""
+        with self._lock:
+            return [subscriber.kind for subscriber in self._subscribers]
+
+    def stats(self):
+        with self._lock:
+            pipeline = self.pipeline
+            subscribers = [subscriber.stats() for subscriber in self._subscribers]
+        return {
+            'running': pipeline is not None and pipeline.running,
+            'published': self.published,
+            'skipped': self.skipped,
+            'subscribers': subscribers,
+            'pipeline': pipeline.stats() if pipeline is not None else None,
+        }
@@ -0,0 +1,93 @@
+import threading
+
+import numpy as np
+
+
+class PreparedGarment:
+    """A premultiplied garment cropped to its visible pixels, ready to blend"""
+
+    __slots__ = ('color', 'inv_alpha', 'offset_x', 'offset_y', 'width', 'height', 'nbytes')
+
+    def __init__(self, color, inv_alpha, offset_x, offset_y, width, height):
+        self.color = color
+        self.inv_alpha = inv_alpha
+        self.offset_x = offset_x
+        self.offset_y = offset_y
+        self.width = width
+        self.height = height
+        self.nbytes = color.nbytes + inv_alpha.nbytes
+
+
+def prepare_garment(premultiplied):
+    """Crop a premultiplied BGRA image to its alpha bounding box and precompute 255 - alpha"""
+    height, width = premultiplied.shape[:2]
+    alpha = premultiplied[..., 3]
+    rows = np.flatnonzero(alpha.any(axis=1))
+    cols = np.flatnonzero(alpha.any(axis=0))
+    if rows.size == 0:
+        empty = np.zeros((0, 0, 3), dtype=np.uint8)
+        return PreparedGarment(empty, np.zeros((0, 0, 1), dtype=np.uint16), 0, 0, width, height)
+    top, bottom = rows[0], rows[-1] + 1
+    left, right = cols[0], cols[-1] + 1
+    visible = premultiplied[top:bottom, left:right]
+    color = np.ascontiguousarray(visible[..., :3])
+    inv_alpha = 255 - visible[..., 3:].astype(np.uint16)
+    return PreparedGarment(color, inv_alpha, int(left), int(top), width, height)
+
+
+class Compositor:
+    """Blends prepared garments into uint8 frames in place using uint16 fixed point.
+
+    Scratch buffers are grown on demand and reused, so steady-state blending
+    does not allocate. A compositor is not thread-safe; use ``composite``
+    which keeps one per thread.
+    """
+
+    def __init__(self):
+        self._product = np.empty(0, dtype=np.uint16)
+        self._carry = np.empty(0, dtype=np.uint16)
+
+    def _buffers(self, shape):
+        size = shape[0] * shape[1] * shape[2]
+        if self._product.size < size:
+            self._product = np.empty(size, dtype=np.uint16)
+            self._carry = np.empty(size, dtype=np.uint16)
+        return self._product[:size].reshape(shape), self._carry[:size].reshape(shape)
+
+    def blend(self, background, garment, x, y):
+        """Blend garment with its top-left corner at (x, y); offsets may be negative"""
+        if garment is None or garment.color.size == 0:
+            return background
+        frame_h, frame_w = background.shape[:2]
+        left = x + garment.offset_x
+        top = y + garment.offset_y
+        src_h, src_w = garment.color.shape[:2]
+        dst_x0, dst_y0 = max(0, left), max(0, top)
+        dst_x1, dst_y1 = min(frame_w, left + src_w), min(frame_h, top + src_h)
+        if dst_x1 <= dst_x0 or dst_y1 <= dst_y0:
+            return background
+        src_x0, src_y0 = dst_x0 - left, dst_y0 - top
+        src_x1, src_y1 = src_x0 + dst_x1 - dst_x0, src_y0 + dst_y1 - dst_y0
+
+        roi = background[dst_y0:dst_y1, dst_x0:dst_x1]
+        product, carry = self._buffers(roi.shape)
+        # roi * (255 - a) / 255 with exact rounding: (t + 128 + ((t + 128) >> 8)) >> 8
+        np.multiply(roi, garment.inv_alpha[src_y0:src_y1, src_x0:src_x1], out=product)
+        product += 128
+        np.right_shift(product, 8, out=carry)
+        product += carry
+        product >>= 8
+        product += garment.color[src_y0:src_y1, src_x0:src_x1]
+        np.copyto(roi, product, casting='unsafe')
+        return background
+
+
+_local = threading.local()
+
+
+def composite(background, garment, x, y):
+    """Blend a prepared garment into background in place using this thread's compositor"""
+    compositor = getattr(_local, 'compositor', None)
+    if compositor is None:
+        compositor = _local.compositor = Compositor()
+    return compositor.blend(background, garment, x, y)
@@ -0,0 +1,164 @@
+import os
+import time
+
+import cv2
+import numpy as np
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.webp')
+DEFAULT_FPS = 30
+
+
+class FrameSource:
+    """Something that yields BGR frames: ``read()`` returns a frame or None at the end
+
+    After ``pace(fps)`` reads are spaced 1/fps seconds apart, as a camera
+    would deliver them; a reader that falls behind is not made to catch up.
+    """
+
+    interval = 0
+
+    def pace(self, fps):
+        self.interval = 1.0 / fps if fps else 0
+        self._next = time.monotonic()
+        return self
+
+    def _wait(self):
+        if self.interval:
+            delay = self._next - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            self._next = max(self._next, time.monotonic() - self.interval) + self.interval
+
+    def read(self):
+        raise NotImplementedError
+
+    def grab(self):
+        """Take the next frame and drop it, keeping a live source's buffer fresh; False at the end"""
+        return self.read() is not None
+
+    def release(self):
+        pass
+
+    def __iter__(self):
+        while True:
+            frame = self.read()
+            if frame is None:
+                return
+            yield frame
+
+
+class DeviceSource(FrameSource):
+    """A live camera opened through cv2.VideoCapture"""
+
+    def __init__(self, index=0, width=None, height=None):
+        self.cap = cv2.VideoCapture(index)
+        if width:
+            self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+        if height:
+            self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+
+    def read(self):
+        success, frame = self.cap.read()
+        return frame if success else None
+
+    def grab(self):
+        # Dequeues the frame without decoding it
+        return self.cap.grab()
+
+    def release(self):
+        self.cap.release()
+
+
+class VideoFileSource(FrameSource):
+    """A recorded clip; ``loop`` restarts it at the end, ``realtime`` paces reads to the clip's fps"""
+
+    def __init__(self, path, loop=False, realtime=False):
+        self.path = path
+        self.loop = loop
+        self.cap = cv2.VideoCapture(path)
+        if not self.cap.isOpened():
+            raise ValueError(f"Cannot open video file: {path}")
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or DEFAULT_FPS
+        if realtime:
+            self.pace(self.fps)
+
+    def read(self):
+        self._wait()
+        success, frame = self.cap.read()
+        if not success and self.loop:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            success, frame = self.cap.read()
+        return frame if success else None
+
+    def release(self):
+        self.cap.release()
+
+
+class ImageDirectorySource(FrameSource):
+    """Every image in a directory, in filename order"""
+
+    def __init__(self, path, loop=False):
+        self.paths = sorted(os.path.join(path, name) for name in os.listdir(path)
+                            if name.lower().endswith(IMAGE_EXTENSIONS))
+        if not self.paths:
+            raise ValueError(f"No images in {path}")
+        self.loop = loop
+        self.position = 0
+
+    def read(self):
+        self._wait()
+        while True:
+            if self.position >= len(self.paths):
+                if not self.loop:
+                    return None
+                self.position = 0
+            frame = cv2.imread(self.paths[self.position])
+            self.position += 1
+            if frame is not None:
+                return frame
+
+
+class SyntheticSource(FrameSource):
+    """Generated frames (noisy background and a moving block) for runs without any footage"""
+
+    def __init__(self, width=1280, height=720, frames=None, seed=0):
+        self.width = width
+        self.height = height
+        self.frames = frames
+        self.index = 0
+        rng = np.random.default_rng(seed)
+        self.background = rng.integers(0, 256, (height, width, 3), dtype=np.uint8)
+
+    def read(self):
+        if self.frames is not None and self.index >= self.frames:
+            return None
+        self._wait()
+        frame = self.background.copy()
+        block = max(8, self.width // 8)
+        x = int((np.sin(self.index / 15.0) + 1) / 2 * (self.width - block))
+        y = self.height // 3
+        frame[y:y + block, x:x + block] = (40, 160, 220)
+        self.index += 1
+        return frame
+
+
+def open_source(spec, loop=False, realtime=False, fps=None):
+    """Open a frame source from a spec.
+
+    ``device:<index>``, ``synthetic:<width>x<height>``, a directory of
+    images or a video file path. With ``realtime`` every source but a
+    camera (which paces itself) delivers ``fps`` frames a second; a video
+    file defaults to its own frame rate, the others to DEFAULT_FPS.
+    """
+    if spec.startswith('device:'):
+        return DeviceSource(int(spec.split(':', 1)[1] or 0))
+    if spec.startswith('synthetic'):
+        size = spec.split(':', 1)[1] if ':' in spec else '1280x720'
+        width, height = (int(v) for v in size.lower().split('x'))
+        source = SyntheticSource(width, height)
+    elif os.path.isdir(spec):
+        source = ImageDirectorySource(spec, loop=loop)
+    else:
+        source = VideoFileSource(spec, loop=loop)
+        fps = fps or source.fps
+    return source.pace(fps or DEFAULT_FPS) if realtime else source
@@ -0,0 +1,117 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+
+class StreamBusy(Exception):
+    """Raised when a client sends a frame before its previous one finished, or the pool is full"""
+
+
+class UploadStream:
+    """Inference state for one uploading client"""
+
+    __slots__ = ('engine', 'busy', 'last_used', 'frames')
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.busy = False
+        self.last_used = time.monotonic()
+        self.frames = 0
+
+
+class FrameUploadService:
+    """Runs client-uploaded frames through inference on a bounded worker pool.
+
+    Each client stream gets its own inference engine (MediaPipe tracks state
+    between frames) and may only have one request in flight. At most
+    ``max_pending`` requests are accepted across all streams; beyond that
+    ``submit`` raises StreamBusy so the client backs off rather than piling
+    up work. Streams idle for ``idle_timeout`` seconds release their models.
+    """
+
+    def __init__(self, create_engine, max_workers=4, max_pending=8, max_streams=32, idle_timeout=120):
+        self._create_engine = create_engine
+        self._executor = ThreadPoolExecutor(max_workers, thread_name_prefix='frame-upload')
+        self._pending = threading.BoundedSemaphore(max_pending)
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.max_streams = max_streams
+        self.idle_timeout = idle_timeout
+        self._streams = {}
+        self._lock = threading.Lock()
+        self.processed = 0
+        self.rejected = 0
+
+    def _acquire_stream(self, stream_id):
+        with self._lock:
+            self._sweep()
+            stream = self._streams.get(stream_id)
+            if stream is None:
+                if len(self._streams) >= self.max_streams:
+                    self.rejected += 1
+                    raise StreamBusy('Too many active upload streams')
+                stream = self._streams[stream_id] = UploadStream(None)
+            if stream.busy:
+                self.rejected += 1
+                raise StreamBusy('Previous frame for this stream is still processing')
+            if not self._pending.acquire(blocking=False):
+                self.rejected += 1
+                raise StreamBusy('Frame workers are saturated')
+            stream.busy = True
+            stream.last_used = time.monotonic()
+            return stream
+
+    def _release_stream(self, stream):
+        with self._lock:
+            stream.busy = False
+            stream.last_used = time.monotonic()
+        self._pending.release()
+
+    def _sweep(self):
+        now = time.monotonic()
+        idle = [sid for sid, stream in self._streams.items()
+                if not stream.busy and now - stream.last_used > self.idle_timeout]
+        for sid in idle:
+            stream = self._streams.pop(sid)
+            if stream.engine is not None:
+                stream.engine.close()
+
+    def submit(self, stream_id, frames, handle, mirror=True):
+        """Queue encoded frames for a stream; returns a Future of ``[handle(image, results), ...]``"""
+        stream = self._acquire_stream(stream_id)
+        try:
+            future = self._executor.submit(self._run, stream, frames, handle, mirror)
+        except Exception:
+            self._release_stream(stream)
+            raise
+        future.add_done_callback(lambda _: self._release_stream(stream))
+        return future
+
+    def _run(self, stream, frames, handle, mirror):
+        if stream.engine is None:
+            stream.engine = self._create_engine()
+        outputs = []
+        for data in frames:
+            image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+            if image is None:
+                raise ValueError('Could not decode uploaded frame')
+            if mirror:
+                image = cv2.flip(image, 1)
+            outputs.append(handle(image, stream.engine(image)))
+            stream.frames += 1
+            self.processed += 1
+        return outputs
+
+    def stats(self):
+        with self._lock:
+            return {
+                'streams': len(self._streams),
+                'busy_streams': sum(1 for stream in self._streams.values() if stream.busy),
+                'max_workers': self.max_workers,
+                'max_pending': self.max_pending,
+                'processed': self.processed,
+                'rejected': self.rejected,
+            }
@@ -0,0 +1,175 @@
+import os
+import threading
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+from compositing import prepare_garment
+
+
+def premultiply_alpha(image):
+    """Return a BGRA copy of image with its colour channels premultiplied by alpha"""
+    if image.ndim == 2:
+        image = cv2.cvtColor(image, cv2.COLOR_GRAY2BGRA)
+    elif image.shape[2] == 3:
+        image = cv2.cvtColor(image, cv2.COLOR_BGR2BGRA)
+    else:
+        image = image.copy()
+    alpha = image[..., 3:].astype(np.uint16)
+    colour = image[..., :3].astype(np.uint16) * alpha + 127
+    image[..., :3] = colour // 255
+    return image
+
+
+class GarmentCache:
+    """LRUs of decoded garment PNGs and of resized, blend-ready variants.
+
+    Masters are kept premultiplied so resizing does not pull dark fringes in
+    from transparent pixels; at most ``max_master_bytes`` of them stay
+    decoded. Variants are keyed by filename and size rounded to ``quantum``
+    pixels, so shoulder jitter reuses the same variant. Files are not
+    checked on every frame: ``track(version)`` re-checks the loaded
+    garments when ShirtCatalog.version changes, which its once-a-second
+    check of the files' mtimes and sizes takes care of.
+    """
+
+    def __init__(self, folder, quantum=4, max_bytes=64 * 1024 * 1024, max_master_bytes=256 * 1024 * 1024):
+        self.folder = folder
+        self.quantum = max(1, int(quantum))
+        self.max_bytes = max_bytes
+        self.max_master_bytes = max_master_bytes
+        self._masters = OrderedDict()
+        self._master_bytes = 0
+        self._variants = OrderedDict()
+        self._variant_bytes = 0
+        self._lock = threading.Lock()
+        self._version = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _stat_file(self, name):
+        try:
+            st = os.stat(os.path.join(self.folder, name))
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def quantize(self, value):
+        """Round a pixel size to the cache quantum"""
+        return max(self.quantum, int(round(value / self.quantum)) * self.quantum)
+
+    def preload(self, names=None, limit=None):
+        """Decode up to ``limit`` garments up front (stopping once the master budget is full)"""
+        if names is None:
+            try:
+                names = sorted(os.listdir(self.folder))
+            except OSError:
+                names = []
+        for name in list(names)[:limit]:
+            if self.master(name) is not None and self._master_bytes >= self.max_master_bytes:
+                break
+
+    def master(self, name):
+        """Return the full-size premultiplied BGRA image for a garment, or None"""
+        with self._lock:
+            entry = self._masters.get(name)
+            if entry is not None:
+                self._masters.move_to_end(name)
+        if entry is not None:
+            return entry[1]
+        signature = self._stat_file(name)
+        if signature is None:
+            return None
+        image = cv2.imread(os.path.join(self.folder, name), cv2.IMREAD_UNCHANGED)
+        if image is None:
+            return None
+        image = premultiply_alpha(image)
+        with self._lock:
+            previous = self._masters.pop(name, None)
+            if previous is not None:
+                self._master_bytes -= previous[1].nbytes
+            self._masters[name] = (signature, image)
+            self._master_bytes += image.nbytes
+            while self._master_bytes > self.max_master_bytes and len(self._masters) > 1:
+                _, (_, old) = self._masters.popitem(last=False)
+                self._master_bytes -= old.nbytes
+        return image
+
+    def get(self, name, width, height):
+        """Return a PreparedGarment close to width x height, or None.
+
+        The returned garment is shared with other callers and must not be
+        modified.
+        """
+        if width <= 0 or height <= 0:
+            return None
+        key = (name, self.quantize(width), self.quantize(height))
+        with self._lock:
+            variant = self._variants.get(key)
+            if variant is not None:
+                self._variants.move_to_end(key)
+                self.hits += 1
+                return variant
+            self.misses += 1
+        source = self.master(name)
+        if source is None:
+            return None
+        size = (key[1], key[2])
+        shrinking = size[0] < source.shape[1] and size[1] < source.shape[0]
+        variant = prepare_garment(cv2.resize(source, size, interpolation=cv2.INTER_AREA if shrinking else cv2.INTER_LINEAR))
+        with self._lock:
+            if key not in self._variants:
+                self._variants[key] = variant
+                self._variant_bytes += variant.nbytes
+                self._evict()
+        return variant
+
+    def _evict(self):
+        while self._variant_bytes > self.max_bytes and len(self._variants) > 1:
+            _, old = self._variants.popitem(last=False)
+            self._variant_bytes -= old.nbytes
+            self.evictions += 1
+
+    def invalidate(self, name=None):
+        """Drop one garment (or everything) from the cache"""
+        with self._lock:
+            if name is None:
+                self._masters.clear()
+                self._master_bytes = 0
+                self._variants.clear()
+                self._variant_bytes = 0
+                return
+            entry = self._masters.pop(name, None)
+            if entry is not None:
+                self._master_bytes -= entry[1].nbytes
+            for key in [key for key in self._variants if key[0] == name]:
+                self._variant_bytes -= self._variants.pop(key).nbytes
+
+    def track(self, version):
+        """Re-check the loaded garments when ``version`` (the garment folder's) differs from last time"""
+        if version != self._version:
+            self._version = version
+            self.refresh()
+
+    def refresh(self):
+        """Invalidate garments whose files changed since they were decoded"""
+        with self._lock:
+            loaded = [(name, entry[0]) for name, entry in self._masters.items()]
+        for name, signature in loaded:
+            if self._stat_file(name) != signature:
+                self.invalidate(name)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'garments': len(self._masters),
+                'master_bytes': self._master_bytes,
+                'variants': len(self._variants),
+                'variant_bytes': self._variant_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
@@ -0,0 +1,106 @@
+import threading
+
+import cv2
+
+
+class IdleDetector:
+    """Tells when nobody is in front of the camera, so the pipeline can slow down.
+
+    Every captured frame is shrunk to a tiny grayscale thumbnail and compared
+    with the previous one; a mean difference above ``motion_threshold``
+    (0-255 scale) counts as motion, as does any frame where the pose model
+    finds someone. The scene turns idle after ``idle_after`` seconds without
+    either and wakes on the first frame that shows one. While idle, frames
+    are processed at most ``idle_fps`` times a second and the models run at
+    most once every ``idle_inference_interval`` seconds.
+
+    The capture thread calls ``capture_delay`` and ``observe_frame`` (the
+    thumbnail buffers are its own), the inference thread ``should_infer``
+    and ``observe_pose``; the shared state they update is guarded by a lock.
+    """
+
+    def __init__(self, idle_after=5.0, motion_threshold=2.5, idle_fps=4.0, idle_inference_interval=1.0,
+                 size=(32, 24)):
+        self.idle_after = idle_after
+        self.motion_threshold = motion_threshold
+        self.idle_fps = idle_fps
+        self.idle_inference_interval = idle_inference_interval
+        self.size = size
+        self._small = None
+        self._gray = None
+        self._previous = None
+        self._diff = None
+        self._lock = threading.Lock()
+        self._last_activity = None
+        self._last_frame = 0.0
+        self._last_inference = 0.0
+        self.idle = False
+        self.idle_periods = 0
+        self.skipped_inferences = 0
+        self.reused_frames = 0
+
+    def _active(self, t):
+        with self._lock:
+            self._last_activity = t
+            self.idle = False
+
+    def _update(self, t):
+        with self._lock:
+            if self._last_activity is None:
+                self._last_activity = t
+            if not self.idle and t - self._last_activity > self.idle_after:
+                self.idle = True
+                self.idle_periods += 1
+
+    def capture_delay(self, t):
+        """Seconds until the next frame should be processed (0 unless idle); frames before that are dropped"""
+        with self._lock:
+            if not self.idle:
+                return 0.0
+            return max(0.0, self._last_frame + 1.0 / self.idle_fps - t)
+
+    def observe_frame(self, frame, t):
+        """Compare a captured BGR frame with the previous one; returns True on motion"""
+        with self._lock:
+            self._last_frame = t
+        self._small = cv2.resize(frame, self.size, dst=self._small, interpolation=cv2.INTER_AREA)
+        self._gray = cv2.cvtColor(self._small, cv2.COLOR_BGR2GRAY, dst=self._gray)
+        if self._previous is None:
+            self._previous = self._gray.copy()
+            self._update(t)
+            return False
+        self._diff = cv2.absdiff(self._gray, self._previous, dst=self._diff)
+        self._previous, self._gray = self._gray, self._previous
+        moved = cv2.mean(self._diff)[0] > self.motion_threshold
+        if moved:
+            self._active(t)
+        else:
+            self._update(t)
+        return moved
+
+    def should_infer(self, t):
+        """Whether the models should run on this frame: always, except at most once an interval while idle"""
+        with self._lock:
+            if self.idle and t - self._last_inference < self.idle_inference_interval:
+                self.skipped_inferences += 1
+                return False
+            self._last_inference = t
+            return True
+
+    def reuse(self):
+        """Count a frame whose previous output was sent again instead of rendering it"""
+        with self._lock:
+            self.reused_frames += 1
+
+    def observe_pose(self, present, t):
+        if present:
+            self._active(t)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'idle': self.idle,
+                'idle_periods': self.idle_periods,
+                'skipped_inferences': self.skipped_inferences,
+                'reused_frames': self.reused_frames,
+            }
@@ -0,0 +1,77 @@
+import time
+
+from inference_region import InferenceRegion
+from inference_scheduler import InferenceScheduler
+from landmarks import pose_to_array, hands_to_arrays
+
+
+class InferenceEngine:
+    """Pose and hands models plus the scheduler and input region for one video stream.
+
+    MediaPipe models keep tracking state between frames, so every stream
+    (the webcam, each uploading client) needs its own engine, and an engine
+    must only be used by one thread at a time. With ``metrics`` the colour
+    conversion and each model call are timed as the 'convert', 'pose' and
+    'hands' stages.
+    """
+
+    def __init__(self, pose, hands, scheduler, region, metrics=None):
+        self.pose = pose
+        self.hands = hands
+        self.scheduler = scheduler
+        self.region = region
+        self.metrics = metrics
+
+    def _record(self, stage, start):
+        if self.metrics is not None:
+            self.metrics.observe(stage, time.perf_counter() - start)
+
+    def __call__(self, image):
+        """Run the models on a BGR frame as the scheduler decides; returns an InferenceResult"""
+        image_rgb = None
+
+        def rgb():
+            # Downscaled (and cropped around the body) only if a model actually runs
+            nonlocal image_rgb
+            if image_rgb is None:
+                start = time.perf_counter()
+                image_rgb = self.region.prepare(image)
+                self._record('convert', start)
+            return image_rgb
+
+        def run_pose():
+            model_input = rgb()
+            start = time.perf_counter()
+            landmarks = self.pose.process(model_input).pose_landmarks
+            self._record('pose', start)
+            return self.region.to_frame(pose_to_array(landmarks))
+
+        def run_hands():
+            model_input = rgb()
+            start = time.perf_counter()
+            landmarks = self.hands.process(model_input).multi_hand_landmarks
+            self._record('hands', start)
+            return [self.region.to_frame(hand) for hand in hands_to_arrays(landmarks)]
+
+        results = self.scheduler.step(run_pose, run_hands)
+        if results.pose_fresh:
+            self.region.track(results.pose)
+        return results
+
+    def close(self):
+        self.pose.close()
+        self.hands.close()
+
+    def stats(self):
+        return dict(self.scheduler.stats(), region=self.region.stats())
+
+
+def create_engine(pose_every=1, hands_every=3, region_mode='crop', max_side=640, metrics=None):
+    """MediaPipe pose and hands models with their scheduler and input region, for one video stream"""
+    import mediapipe as mp
+    pose = mp.solutions.pose.Pose(static_image_mode=False, min_detection_confidence=0.5, min_tracking_confidence=0.5)
+    hands = mp.solutions.hands.Hands(static_image_mode=False, max_num_hands=2, min_detection_confidence=0.5,
+                                     min_tracking_confidence=0.5)
+    scheduler = InferenceScheduler(pose_every=pose_every, hands_every=hands_every)
+    region = InferenceRegion(mode=region_mode, max_side=max_side)
+    return InferenceEngine(pose, hands, scheduler, region, metrics=metrics)
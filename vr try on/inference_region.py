@@ -0,0 +1,96 @@
+import cv2
+
+
+class InferenceRegion:
+    """Picks the part of the frame the models see and maps their landmarks back.
+
+    Modes: ``'full'`` passes the whole frame, ``'downscale'`` shrinks it so
+    its longest side is at most ``max_side`` and ``'crop'`` additionally
+    crops around the body found by the previous pose result (padded by
+    ``margin`` of its size). The crop only moves when the body nears its
+    edge or changes size noticeably, so MediaPipe's own tracking stays
+    valid, and falls back to the full frame when the pose is lost.
+
+    Call ``prepare`` once per frame, map model output with ``to_frame`` and
+    feed fresh pose results back through ``track``.
+    """
+
+    MODES = ('full', 'downscale', 'crop')
+
+    def __init__(self, mode='crop', max_side=640, margin=0.35, min_visibility=0.5):
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown inference region mode: {mode}")
+        self.mode = mode
+        self.max_side = max_side
+        self.margin = margin
+        self.min_visibility = min_visibility
+        self.crop = None
+        self.region = None
+        self.frame_shape = None
+
+    def prepare(self, image):
+        """Return the RGB model input for this frame and remember where it came from"""
+        height, width = image.shape[:2]
+        self.frame_shape = (height, width)
+        if self.crop is None or self.mode != 'crop':
+            x0, y0, x1, y1 = 0, 0, width, height
+        else:
+            x0, y0, x1, y1 = self.crop
+        self.region = (x0, y0, x1 - x0, y1 - y0)
+        view = image[y0:y1, x0:x1]
+        longest = max(view.shape[:2])
+        if self.mode != 'full' and self.max_side and longest > self.max_side:
+            scale = self.max_side / longest
+            size = (max(1, int(view.shape[1] * scale)), max(1, int(view.shape[0] * scale)))
+            view = cv2.resize(view, size, interpolation=cv2.INTER_AREA)
+        return cv2.cvtColor(view, cv2.COLOR_BGR2RGB)
+
+    def to_frame(self, landmarks):
+        """Map landmarks normalised to the model input back to full-frame normalised coordinates"""
+        if landmarks is None or self.region is None:
+            return landmarks
+        x0, y0, region_w, region_h = self.region
+        height, width = self.frame_shape
+        if (x0, y0, region_w, region_h) == (0, 0, width, height):
+            return landmarks
+        mapped = landmarks.copy()
+        mapped[:, 0] = (landmarks[:, 0] * region_w + x0) / width
+        mapped[:, 1] = (landmarks[:, 1] * region_h + y0) / height
+        mapped[:, 2] = landmarks[:, 2] * region_w / width
+        return mapped
+
+    def track(self, pose):
+        """Update the crop from a fresh full-frame pose array (None = tracking lost)"""
+        if self.mode != 'crop' or self.frame_shape is None:
+            return
+        if pose is None:
+            self.crop = None
+            return
+        visible = pose[pose[:, 3] >= self.min_visibility]
+        if len(visible) < 4:
+            self.crop = None
+            return
+        height, width = self.frame_shape
+        bx0, by0 = visible[:, 0].min() * width, visible[:, 1].min() * height
+        bx1, by1 = visible[:, 0].max() * width, visible[:, 1].max() * height
+        pad = self.margin * max(bx1 - bx0, by1 - by0)
+        crop = (int(max(0, bx0 - pad)), int(max(0, by0 - pad)),
+                int(min(width, bx1 + pad)), int(min(height, by1 + pad)))
+        if crop[2] - crop[0] < 32 or crop[3] - crop[1] < 32:
+            self.crop = None
+        elif self.crop is None or not self._still_fits(crop, bx0, by0, bx1, by1):
+            self.crop = crop
+
+    def _still_fits(self, crop, bx0, by0, bx1, by1):
+        cx0, cy0, cx1, cy1 = self.crop
+        inside = bx0 >= cx0 and by0 >= cy0 and bx1 <= cx1 and by1 <= cy1
+        width_ratio = (crop[2] - crop[0]) / (cx1 - cx0)
+        height_ratio = (crop[3] - crop[1]) / (cy1 - cy0)
+        return inside and 0.7 <= width_ratio <= 1.3 and 0.7 <= height_ratio <= 1.3
+
+    def stats(self):
+        return {
+            'mode': self.mode,
+            'region': list(self.region) if self.region else None,
+            'tracking': self.crop is not None,
+        }
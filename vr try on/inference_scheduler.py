@@ -0,0 +1,109 @@
+import numpy as np
+
+from landmarks import LEFT_SHOULDER, RIGHT_SHOULDER, LEFT_WRIST, RIGHT_WRIST, LEFT_HIP, RIGHT_HIP
+
+
+class InferenceResult:
+    """Landmarks for one frame; ``pose_fresh``/``hands_fresh`` say whether the models ran on it"""
+
+    __slots__ = ('pose', 'hands', 'pose_fresh', 'hands_fresh')
+
+    def __init__(self, pose=None, hands=(), pose_fresh=False, hands_fresh=False):
+        self.pose = pose
+        self.hands = hands
+        self.pose_fresh = pose_fresh
+        self.hands_fresh = hands_fresh
+
+
+class InferenceScheduler:
+    """Runs pose and hands models at their own cadence and fills the gaps.
+
+    Pose runs every ``pose_every`` frames and is extrapolated at constant
+    velocity in between (for at most ``max_extrapolate`` frames). Hands run
+    every ``hands_every`` frames, and not at all while pose shows both wrists
+    below the hips; skipped frames carry no hands, so gestures are only ever
+    detected on fresh results. When the tracked landmarks move faster than
+    ``motion_threshold`` (normalised units per frame) both models run every
+    frame for the next ``boost_frames`` frames.
+    """
+
+    TRACKED = [LEFT_SHOULDER, RIGHT_SHOULDER, LEFT_WRIST, RIGHT_WRIST]
+
+    def __init__(self, pose_every=1, hands_every=3, motion_threshold=0.02, boost_frames=15, max_extrapolate=4):
+        self.pose_every = max(1, pose_every)
+        self.hands_every = max(1, hands_every)
+        self.motion_threshold = motion_threshold
+        self.boost_frames = boost_frames
+        self.max_extrapolate = max_extrapolate
+        self.frame_index = 0
+        self.boost_until = -1
+        self._pose = None
+        self._velocity = None
+        self._pose_frame = 0
+        self.pose_runs = 0
+        self.hands_runs = 0
+
+    def _boosted(self):
+        return self.frame_index <= self.boost_until
+
+    def _wrist_near_upper_body(self, pose):
+        if pose is None:
+            return True
+        hips_y = pose[[LEFT_HIP, RIGHT_HIP], 1]
+        if pose[[LEFT_HIP, RIGHT_HIP], 3].min() < 0.5:
+            shoulders = pose[[LEFT_SHOULDER, RIGHT_SHOULDER]]
+            hips_y = shoulders[:, 1] + 2 * abs(shoulders[0, 0] - shoulders[1, 0])
+        wrists = pose[[LEFT_WRIST, RIGHT_WRIST]]
+        visible = wrists[:, 3] >= 0.5
+        return bool(np.any(visible & (wrists[:, 1] < hips_y.max())))
+
+    def _predict_pose(self):
+        if self._pose is None:
+            return None
+        steps = min(self.frame_index - self._pose_frame, self.max_extrapolate)
+        if self._velocity is None or steps <= 0:
+            return self._pose
+        predicted = self._pose.copy()
+        predicted[:, :3] += self._velocity * steps
+        return predicted
+
+    def _observe_pose(self, pose):
+        if pose is not None and self._pose is not None:
+            frames = max(1, self.frame_index - self._pose_frame)
+            self._velocity = (pose[:, :3] - self._pose[:, :3]) / frames
+            speed = np.abs(self._velocity[self.TRACKED, :2]).max()
+            if speed > self.motion_threshold:
+                self.boost_until = self.frame_index + self.boost_frames
+        else:
+            self._velocity = None
+        self._pose = pose
+        self._pose_frame = self.frame_index
+
+    def step(self, run_pose, run_hands):
+        """Process one frame; ``run_pose()`` returns a pose array or None, ``run_hands()`` a list of hand arrays"""
+        boosted = self._boosted()
+        pose_fresh = boosted or self._pose is None or self.frame_index % self.pose_every == 0
+        if pose_fresh:
+            self._observe_pose(run_pose())
+            self.pose_runs += 1
+            pose = self._pose
+        else:
+            pose = self._predict_pose()
+
+        hands_fresh = (boosted or self.frame_index % self.hands_every == 0) and self._wrist_near_upper_body(pose)
+        hands = []
+        if hands_fresh:
+            hands = run_hands()
+            self.hands_runs += 1
+
+        self.frame_index += 1
+        return InferenceResult(pose, hands, pose_fresh, hands_fresh)
+
+    def stats(self):
+        frames = max(1, self.frame_index)
+        return {
+            'frames': self.frame_index,
+            'pose_rate': round(self.pose_runs / frames, 2),
+            'hands_rate': round(self.hands_runs / frames, 2),
+            'boosted': self._boosted(),
+        }
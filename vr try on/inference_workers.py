@@ -0,0 +1,324 @@
+import contextlib
+import itertools
+import multiprocessing
+import queue
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import Future
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from inference_scheduler import InferenceResult
+
+
+class _StageTimes:
+    """Collects the engine's stage timings in a worker until they are sent back with the frame"""
+
+    def __init__(self):
+        self.timings = []
+
+    def observe(self, stage, seconds):
+        self.timings.append((stage, seconds))
+
+    def drain(self):
+        timings, self.timings = self.timings, []
+        return timings
+
+
+def _worker_main(requests, responses, create_engine, engine_options):
+    """Worker process: one engine per stream, frames read in place from shared memory"""
+    engines = {}
+    segments = {}
+    stage_times = _StageTimes()
+    parent = multiprocessing.parent_process()
+    while True:
+        try:
+            message = requests.get(timeout=1.0)
+        except queue.Empty:
+            # A killed server cannot tell its workers to stop
+            if parent is not None and not parent.is_alive():
+                break
+            continue
+        if message is None:
+            break
+        kind = message[0]
+        if kind == 'frame':
+            _, stream_id, seq, segment_name, offset, shape = message
+            segment = segments.get(segment_name)
+            if segment is None:
+                segment = segments[segment_name] = shared_memory.SharedMemory(name=segment_name)
+            engine = engines.get(stream_id)
+            if engine is None:
+                engine = engines[stream_id] = create_engine(metrics=stage_times, **engine_options)
+            try:
+                image = np.ndarray(shape, dtype=np.uint8, buffer=segment.buf, offset=offset)
+                results = engine(image)
+                del image
+                responses.put((seq, (results.pose, results.hands, results.pose_fresh, results.hands_fresh),
+                               engine.stats(), stage_times.drain(), None))
+            except Exception as e:
+                responses.put((seq, None, None, stage_times.drain(), repr(e)))
+        elif kind == 'close_stream':
+            engine = engines.pop(message[1], None)
+            if engine is not None:
+                engine.close()
+        elif kind == 'detach':
+            segment = segments.pop(message[1], None)
+            if segment is not None:
+                segment.close()
+    for engine in engines.values():
+        engine.close()
+    for segment in segments.values():
+        segment.close()
+
+
+@contextlib.contextmanager
+def _main_script_hidden():
+    """Keep spawned children from re-running the parent's main script (the whole server for app.py)
+
+    The workers need nothing from it: ``_worker_main`` and the engine factory
+    are imported from their own modules.
+    """
+    main = sys.modules['__main__']
+    saved = main.__dict__.get('__file__'), main.__dict__.get('__spec__')
+    main.__dict__.pop('__file__', None)
+    main.__spec__ = None
+    try:
+        yield
+    finally:
+        if saved[0] is not None:
+            main.__file__ = saved[0]
+        main.__spec__ = saved[1]
+
+
+class _Worker:
+    __slots__ = ('index', 'process', 'requests', 'responses', 'streams', 'reader', 'dead', 'replacement')
+
+
+class RemoteInferenceEngine:
+    """Stands in for an InferenceEngine whose models run in a worker process.
+
+    Frames are copied into a ring of ``slots`` shared-memory slots owned by
+    this stream and only their location is sent to the worker; landmark
+    arrays come back. A worker handles its requests in order, so when a slot
+    is free again every older slot is too and the ring is reused round robin.
+    If the worker has died the stream moves to its replacement (with fresh
+    tracking state) on the next frame; waiting for a slot gives up after
+    ``timeout`` seconds.
+    """
+
+    def __init__(self, pool, worker, stream_id, slots, slot_bytes, timeout):
+        self._pool = pool
+        self._worker = worker
+        self.stream_id = stream_id
+        self._slots = slots
+        self._free = threading.Semaphore(slots)
+        self._next_slot = 0
+        self._timeout = timeout
+        self._segment = None
+        self._slot_bytes = 0
+        self._allocate(slot_bytes)
+        self.frames = 0
+        self.errors = 0
+        self.last_stats = {}
+
+    def _allocate(self, slot_bytes):
+        if self._segment is not None:
+            self._pool._send(self._worker, ('detach', self._segment.name))
+            self._segment.close()
+            self._segment.unlink()
+        self._segment = shared_memory.SharedMemory(create=True, size=slot_bytes * self._slots)
+        self._slot_bytes = slot_bytes
+
+    def _acquire(self, count):
+        deadline = time.monotonic() + self._timeout
+        for acquired in range(count):
+            if not self._free.acquire(timeout=max(0.0, deadline - time.monotonic())):
+                for _ in range(acquired):
+                    self._free.release()
+                raise TimeoutError('No frame slot came free; the inference worker is not answering')
+
+    def submit(self, image):
+        """Queue a BGR frame; returns a Future of the InferenceResult"""
+        image = np.ascontiguousarray(image, dtype=np.uint8)
+        if self._worker.dead or not self._worker.process.is_alive():
+            self._worker = self._pool._replacement(self._worker)
+        self._acquire(1)
+        if image.nbytes > self._slot_bytes:
+            # Larger frames than before: wait for in-flight frames, then grow the ring
+            try:
+                self._acquire(self._slots - 1)
+            except TimeoutError:
+                self._free.release()
+                raise
+            self._allocate(image.nbytes)
+            for _ in range(self._slots - 1):
+                self._free.release()
+        slot = self._next_slot
+        self._next_slot = (slot + 1) % self._slots
+        offset = slot * self._slot_bytes
+        np.copyto(np.ndarray(image.shape, dtype=np.uint8, buffer=self._segment.buf, offset=offset), image)
+        future = Future()
+        future.add_done_callback(lambda _: self._free.release())
+        seq = self._pool._register(future, self)
+        if seq is not None:
+            self._pool._send(self._worker, ('frame', self.stream_id, seq, self._segment.name, offset, image.shape))
+        return future
+
+    def __call__(self, image):
+        """Run inference on a frame; a failed or timed-out frame gives an empty result"""
+        try:
+            results = self.submit(image).result(timeout=self._timeout)
+        except Exception:
+            self.errors += 1
+            return InferenceResult()
+        self.frames += 1
+        return results
+
+    def close(self):
+        self._pool._release(self)
+        self._segment.close()
+        self._segment.unlink()
+
+    def stats(self):
+        return dict(self.last_stats, worker=self._worker.process.pid, remote_frames=self.frames, errors=self.errors)
+
+
+class InferenceWorkerPool:
+    """Worker processes that each own the MediaPipe models for the streams assigned to them.
+
+    ``create_engine(metrics=..., **engine_options)`` must be importable by
+    the workers from a module other than ``__main__`` (they are spawned, not
+    forked, and never run the main script). Each stream is pinned to the
+    worker with the fewest streams, since MediaPipe keeps tracking state per
+    stream; the web process only copies frames into shared memory and
+    composites. The engines' stage timings are replayed into ``metrics``.
+    A worker that dies fails its in-flight frames and is respawned when one
+    of its streams sends the next frame.
+    """
+
+    def __init__(self, create_engine, workers=2, engine_options=None, slot_bytes=1280 * 720 * 3, slots=2,
+                 timeout=5.0, metrics=None):
+        self._context = multiprocessing.get_context('spawn')
+        self._create_engine = create_engine
+        self._engine_options = engine_options or {}
+        self.slot_bytes = slot_bytes
+        self.slots = slots
+        self.timeout = timeout
+        self.metrics = metrics
+        self.restarts = 0
+        self._pending = {}
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self._workers = [self._start_worker(index) for index in range(workers)]
+
+    def _start_worker(self, index, streams=0):
+        worker = _Worker()
+        worker.index = index
+        worker.requests = self._context.Queue()
+        worker.responses = self._context.Queue()
+        worker.streams = streams
+        worker.dead = False
+        worker.replacement = None
+        worker.process = self._context.Process(target=_worker_main, name=f'inference-worker-{index}', daemon=True,
+                                               args=(worker.requests, worker.responses, self._create_engine,
+                                                     self._engine_options))
+        with _main_script_hidden():
+            worker.process.start()
+        worker.reader = threading.Thread(target=self._read_responses, args=(worker,),
+                                         name=f'inference-results-{index}', daemon=True)
+        worker.reader.start()
+        return worker
+
+    def _replacement(self, worker):
+        """The live worker that took over from a dead one, started now if there is none yet"""
+        with self._lock:
+            while worker.replacement is not None:
+                worker = worker.replacement
+            if worker.dead or not worker.process.is_alive():
+                worker.dead = True
+                worker.replacement = self._start_worker(worker.index, worker.streams)
+                self._workers[self._workers.index(worker)] = worker.replacement
+                self.restarts += 1
+                worker = worker.replacement
+            return worker
+
+    def engine(self, stream_id=None):
+        """A RemoteInferenceEngine for a new stream on the least busy worker"""
+        with self._lock:
+            worker = min(self._workers, key=lambda w: w.streams)
+            worker.streams += 1
+        return RemoteInferenceEngine(self, worker, stream_id or uuid.uuid4().hex, self.slots, self.slot_bytes,
+                                     self.timeout)
+
+    def _register(self, future, engine):
+        """Track a frame's future until its worker answers; None (and a failed future) if the worker is gone"""
+        seq = next(self._seq)
+        with self._lock:
+            if not engine._worker.dead:
+                self._pending[seq] = (future, engine, engine._worker)
+                return seq
+        future.set_exception(RuntimeError('Inference worker exited'))
+        return None
+
+    def _send(self, worker, message):
+        worker.requests.put(message)
+
+    def _release(self, engine):
+        self._send(engine._worker, ('close_stream', engine.stream_id))
+        self._send(engine._worker, ('detach', engine._segment.name))
+        with self._lock:
+            engine._worker.streams -= 1
+
+    def _read_responses(self, worker):
+        while True:
+            try:
+                seq, payload, stats, timings, error = worker.responses.get(timeout=1.0)
+            except queue.Empty:
+                if not worker.process.is_alive():
+                    self._fail_pending(worker)
+                    return
+                continue
+            except (EOFError, OSError):
+                return
+            if self.metrics is not None:
+                for stage, seconds in timings:
+                    self.metrics.observe(stage, seconds)
+            with self._lock:
+                future, engine, _ = self._pending.pop(seq, (None, None, None))
+            if future is None:
+                continue
+            if error is not None:
+                future.set_exception(RuntimeError(error))
+            else:
+                engine.last_stats = stats
+                future.set_result(InferenceResult(*payload))
+
+    def _fail_pending(self, worker):
+        with self._lock:
+            worker.dead = True
+            lost = [seq for seq, (_, _, owner) in self._pending.items() if owner is worker]
+            futures = [self._pending.pop(seq)[0] for seq in lost]
+        for future in futures:
+            future.set_exception(RuntimeError('Inference worker exited'))
+
+    def close(self, timeout=5.0):
+        for worker in self._workers:
+            worker.requests.put(None)
+        deadline = time.monotonic() + timeout
+        for worker in self._workers:
+            worker.process.join(max(0.0, deadline - time.monotonic()))
+            if worker.process.is_alive():
+                worker.process.terminate()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'workers': [{'pid': w.process.pid, 'alive': w.process.is_alive(), 'streams': w.streams}
+                            for w in self._workers],
+                'pending': len(self._pending),
+                'restarts': self.restarts,
+            }
@@ -0,0 +1,188 @@
+import math
+
+import numpy as np
+
+from landmarks import LEFT_SHOULDER, RIGHT_SHOULDER, LEFT_HIP, RIGHT_HIP
+
+# Landmarks the shirt placement uses, smoothed together in one update
+PLACEMENT_LANDMARKS = (LEFT_SHOULDER, RIGHT_SHOULDER, LEFT_HIP, RIGHT_HIP)
+
+
+class MovingAverageFilter:
+    """Mean of the last ``window`` samples, kept in a preallocated ring with a running sum"""
+
+    def __init__(self, shape, window=5):
+        self.window = window
+        self._ring = np.zeros((window,) + shape)
+        self._sum = np.zeros(shape)
+        self._out = np.zeros(shape)
+        self._index = 0
+        self.count = 0
+
+    def reset(self):
+        self._sum.fill(0)
+        self._index = 0
+        self.count = 0
+
+    def update(self, sample, t):
+        slot = self._ring[self._index]
+        if self.count == self.window:
+            self._sum -= slot
+        else:
+            self.count += 1
+        slot[...] = sample
+        self._sum += slot
+        self._index = (self._index + 1) % self.window
+        return np.divide(self._sum, self.count, out=self._out)
+
+
+class OneEuroFilter:
+    """One Euro filter (Casiez et al.): smooths hard when still, follows closely when moving fast.
+
+    ``min_cutoff`` (Hz) sets the smoothing at rest and ``beta`` how quickly
+    the cutoff rises with speed (in sample units per second).
+    """
+
+    def __init__(self, shape, min_cutoff=1.0, beta=0.02, d_cutoff=1.0):
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.d_cutoff = d_cutoff
+        self._value = np.zeros(shape)
+        self._speed = np.zeros(shape)
+        self._delta = np.zeros(shape)
+        self._alpha = np.zeros(shape)
+        self._last_t = None
+        self.count = 0
+
+    @staticmethod
+    def _smoothing(cutoff, dt):
+        tau = 1.0 / (2 * math.pi * cutoff)
+        return 1.0 / (1.0 + tau / dt)
+
+    def reset(self):
+        self._last_t = None
+        self.count = 0
+
+    def update(self, sample, t):
+        self.count += 1
+        if self._last_t is None:
+            self._value[...] = sample
+            self._speed.fill(0)
+            self._last_t = t
+            return self._value
+        dt = max(t - self._last_t, 1e-3)
+        self._last_t = t
+        # Speed estimate, itself low-pass filtered: speed += a * (change / dt - speed)
+        np.subtract(sample, self._value, out=self._delta)
+        self._delta /= dt
+        self._delta -= self._speed
+        self._delta *= self._smoothing(self.d_cutoff, dt)
+        self._speed += self._delta
+        # Per-coordinate cutoff rises with speed; alpha = 2 pi fc dt / (2 pi fc dt + 1)
+        np.abs(self._speed, out=self._alpha)
+        self._alpha *= self.beta
+        self._alpha += self.min_cutoff
+        self._alpha *= 2 * math.pi * dt
+        np.add(self._alpha, 1.0, out=self._delta)
+        self._alpha /= self._delta
+        np.subtract(sample, self._value, out=self._delta)
+        self._delta *= self._alpha
+        self._value += self._delta
+        return self._value
+
+
+class ConstantVelocityKalman:
+    """Kalman filter with a constant-velocity model for every coordinate.
+
+    All coordinates share the same noise settings and time steps, so they
+    share one 2x2 covariance and gain: an update is a few scalar operations
+    plus two vectorized array updates. ``process_noise`` is the acceleration
+    variance, ``measurement_noise`` the variance of a measurement.
+    """
+
+    def __init__(self, shape, process_noise=3e3, measurement_noise=4.0):
+        self.q = process_noise
+        self.r = measurement_noise
+        self._position = np.zeros(shape)
+        self._velocity = np.zeros(shape)
+        self._residual = np.zeros(shape)
+        self._scratch = np.zeros(shape)
+        self._p = None
+        self._last_t = None
+        self.count = 0
+
+    def reset(self):
+        self._last_t = None
+        self.count = 0
+
+    def update(self, sample, t):
+        self.count += 1
+        if self._last_t is None:
+            self._position[...] = sample
+            self._velocity.fill(0)
+            self._p = [self.r, 0.0, 0.0, self.r * 100]
+            self._last_t = t
+            return self._position
+        dt = max(t - self._last_t, 1e-3)
+        self._last_t = t
+        # Predict
+        np.multiply(self._velocity, dt, out=self._scratch)
+        self._position += self._scratch
+        p00, p01, p10, p11 = self._p
+        q = self.q
+        p00 += dt * (p10 + p01) + dt * dt * p11 + q * dt ** 4 / 4
+        p01 += dt * p11 + q * dt ** 3 / 2
+        p10 += dt * p11 + q * dt ** 3 / 2
+        p11 += q * dt * dt
+        # Correct with the measurement
+        s = p00 + self.r
+        k0, k1 = p00 / s, p10 / s
+        np.subtract(sample, self._position, out=self._residual)
+        np.multiply(self._residual, k0, out=self._scratch)
+        self._position += self._scratch
+        np.multiply(self._residual, k1, out=self._scratch)
+        self._velocity += self._scratch
+        self._p = [(1 - k0) * p00, (1 - k0) * p01, p10 - k1 * p00, p11 - k1 * p01]
+        return self._position
+
+
+FILTERS = {
+    'average': MovingAverageFilter,
+    'one_euro': OneEuroFilter,
+    'kalman': ConstantVelocityKalman,
+}
+
+
+class LandmarkTracker:
+    """Smooths selected pose landmarks in pixel coordinates with one filter update per frame.
+
+    ``mode`` is 'average' (mean of the last frames, the original behaviour),
+    'one_euro' or 'kalman'. The filter starts over after ``reset_after``
+    seconds without a pose. ``update`` returns an array owned by the
+    tracker that is overwritten on the next update.
+    """
+
+    def __init__(self, indices=PLACEMENT_LANDMARKS, mode='average', reset_after=1.0, **options):
+        if mode not in FILTERS:
+            raise ValueError(f"Unknown smoothing mode: {mode}")
+        self.indices = np.array(indices)
+        self.mode = mode
+        self.reset_after = reset_after
+        self.filter = FILTERS[mode]((len(indices), 2), **options)
+        self._picked = np.zeros((len(indices), 4), dtype=np.float32)
+        self._sample = np.zeros((len(indices), 2))
+        self._scale = np.ones(2)
+        self._last_t = None
+
+    def __len__(self):
+        return self.filter.count
+
+    def update(self, pose, width, height, t):
+        """Smoothed (len(indices), 2) pixel positions for a (33, 4) normalised pose"""
+        if self._last_t is not None and t - self._last_t > self.reset_after:
+            self.filter.reset()
+        self._last_t = t
+        np.take(pose, self.indices, axis=0, out=self._picked)
+        self._scale[0], self._scale[1] = width, height
+        np.multiply(self._picked[:, :2], self._scale, out=self._sample)
+        return self.filter.update(self._sample, t)
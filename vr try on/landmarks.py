@@ -0,0 +1,44 @@
+import numpy as np
+
+# Pose landmark indices used outside MediaPipe (same values as mp.solutions.pose.PoseLandmark)
+LEFT_SHOULDER = 11
+RIGHT_SHOULDER = 12
+LEFT_WRIST = 15
+RIGHT_WRIST = 16
+LEFT_HIP = 23
+RIGHT_HIP = 24
+
+# Hand landmark indices (same values as mp.solutions.hands.HandLandmark)
+WRIST = 0
+THUMB_MCP = 2
+THUMB_TIP = 4
+INDEX_FINGER_MCP = 5
+INDEX_FINGER_TIP = 8
+
+
+def pose_to_array(pose_landmarks):
+    """Convert a pose NormalizedLandmarkList to a (33, 4) float32 array of x, y, z, visibility"""
+    if pose_landmarks is None:
+        return None
+    return np.array([(lm.x, lm.y, lm.z, lm.visibility) for lm in pose_landmarks.landmark], dtype=np.float32)
+
+
+def hands_to_arrays(multi_hand_landmarks):
+    """Convert MediaPipe hand results to a list of (21, 3) float32 arrays of x, y, z"""
+    if not multi_hand_landmarks:
+        return []
+    return [np.array([(lm.x, lm.y, lm.z) for lm in hand.landmark], dtype=np.float32)
+            for hand in multi_hand_landmarks]
+
+
+def to_landmark_list(array):
+    """Build a NormalizedLandmarkList from a landmark array, e.g. for mp_drawing"""
+    # Imported here so importing this module does not load MediaPipe
+    from mediapipe.framework.formats import landmark_pb2
+    landmark_list = landmark_pb2.NormalizedLandmarkList()
+    for row in array:
+        landmark = landmark_list.landmark.add()
+        landmark.x, landmark.y, landmark.z = float(row[0]), float(row[1]), float(row[2])
+        if len(row) > 3:
+            landmark.visibility = float(row[3])
+    return landmark_list
@@ -0,0 +1,150 @@
+"""Render one photo with every garment, as a contact sheet or a zip of composites.
+
+Pose detection runs once on the photo; the shirt box it gives is reused for
+every garment, and garments are composited on a thread pool sharing one
+GarmentCache per folder. The resize, blend and JPEG encode all run in
+OpenCV or NumPy with the GIL released, so threads scale like processes
+without re-importing the server in every worker.
+
+Command line (from the ``vr try on`` directory):
+
+    python lookbook.py photo.jpg -o lookbook.jpg [--zip] [--brand Nike] [--max-price 60]
+"""
+import io
+import math
+import os
+import threading
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from compositing import composite
+from garment_cache import GarmentCache
+from landmarks import pose_to_array
+
+_pose = None
+_pose_lock = threading.Lock()
+_pool = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+_caches = {}
+
+
+def detect_pose(image):
+    """Pose landmarks of a still BGR photo as a (33, 4) array, or None if nobody is found"""
+    global _pose
+    with _pose_lock:
+        if _pose is None:
+            import mediapipe as mp
+            _pose = mp.solutions.pose.Pose(static_image_mode=True, min_detection_confidence=0.5)
+        return pose_to_array(_pose.process(cv2.cvtColor(image, cv2.COLOR_BGR2RGB)).pose_landmarks)
+
+
+def _render_chunk(cache, photo, box, garments, mode, tile_width, quality):
+    """Worker: composite each (filename, label) onto the photo; JPEG bytes for zips, labelled tiles for sheets"""
+    x, y, width, height = box
+    tile_height = round(photo.shape[0] * tile_width / photo.shape[1])
+    outputs = []
+    image = np.empty_like(photo)
+    for filename, label in garments:
+        np.copyto(image, photo)
+        composite(image, cache.get(filename, width, height), x, y)
+        if mode == 'zip':
+            ok, encoded = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+            outputs.append(encoded.tobytes())
+        else:
+            tile = cv2.resize(image, (tile_width, tile_height), interpolation=cv2.INTER_AREA)
+            cv2.rectangle(tile, (0, tile_height - 24), (tile_width, tile_height), (0, 0, 0), -1)
+            cv2.putText(tile, label, (6, tile_height - 7), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
+            outputs.append(tile)
+    return outputs
+
+
+def _get_pool(folder, workers):
+    """The shared thread pool and the garment cache for ``folder``"""
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None:
+            _pool_workers = workers or os.cpu_count() or 1
+            _pool = ThreadPoolExecutor(_pool_workers, thread_name_prefix='lookbook')
+        if folder not in _caches:
+            _caches[folder] = GarmentCache(folder)
+        return _pool, _caches[folder]
+
+
+def render_lookbook(photo, box, garments, folder, mode='sheet', columns=5, tile_width=320,
+                    quality=90, workers=None):
+    """Render ``garments`` ([(filename, label), ...]) at ``box`` (x, y, width, height) onto photo.
+
+    Returns the contact sheet as JPEG bytes for mode 'sheet', or zip file
+    bytes with one JPEG per garment for mode 'zip'.
+    """
+    if mode not in ('sheet', 'zip'):
+        raise ValueError(f"Unknown lookbook mode: {mode}")
+    pool, cache = _get_pool(folder, workers)
+    # Garment files may have been replaced since they were decoded
+    cache.refresh()
+    # A few chunks per thread, each reusing one scratch image
+    chunk_size = max(1, math.ceil(len(garments) / (_pool_workers * 3)))
+    chunks = [garments[i:i + chunk_size] for i in range(0, len(garments), chunk_size)]
+    futures = [pool.submit(_render_chunk, cache, photo, box, chunk, mode, tile_width, quality) for chunk in chunks]
+    results = [output for future in futures for output in future.result()]
+
+    if mode == 'zip':
+        buffer = io.BytesIO()
+        # JPEGs do not compress further, so they are stored
+        with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_STORED) as archive:
+            for index, ((filename, _), data) in enumerate(zip(garments, results)):
+                archive.writestr(f"{index + 1:03d}_{os.path.splitext(filename)[0]}.jpg", data)
+        return buffer.getvalue()
+
+    columns = max(1, min(columns, len(results)))
+    rows = math.ceil(len(results) / columns)
+    tile_height, gap = results[0].shape[0], 8
+    sheet = np.full((rows * (tile_height + gap) + gap, columns * (tile_width + gap) + gap, 3), 255, dtype=np.uint8)
+    for index, tile in enumerate(results):
+        top = gap + (index // columns) * (tile_height + gap)
+        left = gap + (index % columns) * (tile_width + gap)
+        sheet[top:top + tile_height, left:left + tile_width] = tile
+    ok, encoded = cv2.imencode('.jpg', sheet, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    return encoded.tobytes()
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('photo')
+    parser.add_argument('-o', '--output', required=True)
+    parser.add_argument('--zip', action='store_true', help='write a zip of full-size composites instead of a sheet')
+    parser.add_argument('--brand')
+    parser.add_argument('--min-price', type=float)
+    parser.add_argument('--max-price', type=float)
+    parser.add_argument('--columns', type=int, default=5)
+    parser.add_argument('--workers', type=int)
+    parser.add_argument('--mirror', action='store_true', help='mirror the photo like the live view')
+    args = parser.parse_args()
+
+    import app
+    photo = cv2.imread(args.photo)
+    if photo is None:
+        parser.error(f"Cannot read {args.photo}")
+    if args.mirror:
+        photo = cv2.flip(photo, 1)
+    pose = detect_pose(photo)
+    box = app.shirt_box_for_pose(pose, photo.shape[1], photo.shape[0]) if pose is not None else None
+    if box is None:
+        parser.error('No person found in the photo')
+    _, items = app.catalog.query(args.brand, args.min_price, args.max_price)
+    if not items:
+        parser.error('No garments match')
+    data = render_lookbook(photo, box, app.lookbook_garments(items), app.shirtFolderPath,
+                           mode='zip' if args.zip else 'sheet', columns=args.columns, workers=args.workers)
+    with open(args.output, 'wb') as f:
+        f.write(data)
+    print(f"Rendered {len(items)} garments to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
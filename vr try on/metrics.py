@@ -0,0 +1,178 @@
+import sys
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+
+# Upper bounds in seconds: 0.25ms .. 1s, enough resolution for both a putText and a pose pass
+DEFAULT_BUCKETS = (0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.02, 0.035, 0.05, 0.075, 0.1, 0.25, 0.5, 1.0)
+
+
+class Histogram:
+    """Fixed-bucket histogram of durations; ``observe`` is a bisect and a few increments"""
+
+    __slots__ = ('bounds', 'counts', 'sum', 'count', '_lock')
+
+    def __init__(self, bounds=DEFAULT_BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def snapshot(self):
+        """(cumulative bucket counts, sum, count) taken consistently"""
+        with self._lock:
+            counts, total, count = list(self.counts), self.sum, self.count
+        cumulative, running = [], 0
+        for value in counts:
+            running += value
+            cumulative.append(running)
+        return cumulative, total, count
+
+
+class Timer:
+    """Context manager recording the time spent inside it into a stage histogram"""
+
+    __slots__ = ('_histogram', '_start')
+
+    def __init__(self, histogram):
+        self._histogram = histogram
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._histogram.observe(time.perf_counter() - self._start)
+
+
+class Metrics:
+    """Stage timing histograms plus scrape-time gauges, rendered in Prometheus text format.
+
+    Hot paths call ``observe(stage, seconds)`` with a perf_counter delta (or
+    use ``time(stage)``); everything else is registered with ``gauge`` and
+    only evaluated when ``/metrics`` is scraped.
+    """
+
+    def __init__(self, prefix='tryon', buckets=DEFAULT_BUCKETS):
+        self.prefix = prefix
+        self.buckets = buckets
+        self._stages = {}
+        self._gauges = []
+        self._lock = threading.Lock()
+
+    def histogram(self, stage):
+        histogram = self._stages.get(stage)
+        if histogram is None:
+            with self._lock:
+                histogram = self._stages.setdefault(stage, Histogram(self.buckets))
+        return histogram
+
+    def observe(self, stage, seconds):
+        self.histogram(stage).observe(seconds)
+
+    def time(self, stage):
+        return Timer(self.histogram(stage))
+
+    def gauge(self, name, help_text, collect, kind='gauge', label=None):
+        """Register ``collect()`` returning a number, or {label value: number} when ``label`` is set"""
+        self._gauges.append((name, help_text, collect, kind, label))
+
+    def stage_summary(self):
+        """{stage: {count, avg_ms}} for JSON status output"""
+        summary = {}
+        for stage, histogram in sorted(self._stages.items()):
+            _, total, count = histogram.snapshot()
+            summary[stage] = {'count': count, 'avg_ms': round(total / count * 1000, 3) if count else 0.0}
+        return summary
+
+    def render(self):
+        name = f'{self.prefix}_stage_seconds'
+        lines = [f'# HELP {name} Time spent in each frame processing stage',
+                 f'# TYPE {name} histogram']
+        for stage, histogram in sorted(self._stages.items()):
+            cumulative, total, count = histogram.snapshot()
+            for bound, value in zip(self.buckets, cumulative):
+                lines.append(f'{name}_bucket{{stage="{stage}",le="{bound}"}} {value}')
+            lines.append(f'{name}_bucket{{stage="{stage}",le="+Inf"}} {cumulative[-1]}')
+            lines.append(f'{name}_sum{{stage="{stage}"}} {total:.6f}')
+            lines.append(f'{name}_count{{stage="{stage}"}} {count}')
+        for gauge_name, help_text, collect, kind, label in self._gauges:
+            full_name = f'{self.prefix}_{gauge_name}'
+            try:
+                value = collect()
+            except Exception:
+                continue
+            lines.append(f'# HELP {full_name} {help_text}')
+            lines.append(f'# TYPE {full_name} {kind}')
+            if label is None:
+                lines.append(f'{full_name} {value}')
+            else:
+                for label_value, sample in sorted(value.items()):
+                    lines.append(f'{full_name}{{{label}="{label_value}"}} {sample}')
+        return '\n'.join(lines) + '\n'
+
+
+class SamplingProfiler:
+    """Samples every thread's Python stack at a fixed interval while enabled.
+
+    Stacks are aggregated in the collapsed ``frame;frame;frame count`` format
+    that flamegraph tools read. Cheap enough to switch on in production for a
+    few seconds; nothing runs while it is off.
+    """
+
+    def __init__(self, interval=0.005, max_depth=48):
+        self.interval = interval
+        self.max_depth = max_depth
+        self.samples = Counter()
+        self.started = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.running:
+            return
+        self.samples = Counter()
+        self.started = time.time()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        own_id = threading.get_ident()
+        names = {}
+        while not self._stop.wait(self.interval):
+            for thread in threading.enumerate():
+                names[thread.ident] = thread.name
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None and len(stack) < self.max_depth:
+                    code = frame.f_code
+                    stack.append(f'{code.co_name} ({code.co_filename.rsplit("/", 1)[-1]})')
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, str(thread_id)))
+                self.samples[';'.join(reversed(stack))] += 1
+
+    def report(self, limit=None):
+        """Collapsed stacks, most sampled first"""
+        return '\n'.join(f'{stack} {count}' for stack, count in self.samples.most_common(limit)) + '\n'
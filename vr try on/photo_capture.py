@@ -0,0 +1,151 @@
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+
+import cv2
+
+logger = logging.getLogger(__name__)
+
+# Banner drawn in the bottom-left corner of every photo, relative to the frame's bottom edge
+BANNER_LEFT, BANNER_RIGHT, BANNER_TOP, BANNER_BOTTOM = 10, 400, 80, 10
+
+
+class CaptureUnavailable(RuntimeError):
+    """No frame can be captured for the job as things stand (nothing renders its session)"""
+
+
+class CaptureJob:
+    """One photo request; ``future`` resolves to the saved filename"""
+
+    __slots__ = ('capture_id', 'session_id', 'requested', 'future', 'submitted')
+
+    def __init__(self, session_id):
+        self.capture_id = uuid.uuid4().hex[:12]
+        self.session_id = session_id
+        self.requested = time.time()
+        self.future = Future()
+        self.submitted = False
+
+    def as_dict(self):
+        state = {'capture_id': self.capture_id, 'status': 'pending'}
+        if self.future.done():
+            error = self.future.exception()
+            if error is None:
+                state.update(status='ready', filename=self.future.result())
+            else:
+                state.update(status='failed', error=str(error))
+        return state
+
+
+def annotate_banner(frame, lines):
+    """Darken the banner region and write the caption lines into it, touching nothing else"""
+    height, width = frame.shape[:2]
+    top, bottom = max(0, height - BANNER_TOP), max(0, height - BANNER_BOTTOM)
+    left, right = min(BANNER_LEFT, width), min(BANNER_RIGHT, width)
+    banner = frame[top:bottom, left:right]
+    banner[:] = cv2.convertScaleAbs(banner, alpha=0.7)
+    for i, line in enumerate(lines):
+        # First line as the title, the rest as details
+        scale, thickness = (0.6, 2) if i == 0 else (0.5, 1)
+        cv2.putText(frame, line, (20, height - 60 + i * 20), cv2.FONT_HERSHEY_SIMPLEX, scale, (255, 255, 255), thickness)
+    return frame
+
+
+class PhotoCapture:
+    """Writes captured photos on a background pool so the frame loop never blocks on disk.
+
+    ``request`` creates a job, the frame loop passes the rendered frame to
+    ``submit`` (the frame must not be modified afterwards) and a writer
+    thread annotates the banner, encodes and writes the JPEG, then resolves
+    the job's future with the filename. A job no frame was submitted for
+    within ``timeout`` seconds fails instead of staying pending. Written
+    photos are registered with ``gallery`` (a PhotoGallery) when one is
+    given. Recent jobs stay retrievable by id for long-polling clients.
+    """
+
+    def __init__(self, folder, gallery=None, max_workers=2, history=128, quality=92, timeout=10.0):
+        self.folder = folder
+        self.gallery = gallery
+        self.quality = quality
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers, thread_name_prefix='photo-writer')
+        self._jobs = OrderedDict()
+        self._history = history
+        self._lock = threading.Lock()
+        self.written = 0
+        self.failed = 0
+
+    def request(self, session_id):
+        job = CaptureJob(session_id)
+        with self._lock:
+            self._jobs[job.capture_id] = job
+            while len(self._jobs) > self._history:
+                self._jobs.popitem(last=False)
+        if self.timeout is not None:
+            timer = threading.Timer(self.timeout, self.fail, (job, TimeoutError('No frame was rendered in time')))
+            timer.daemon = True
+            timer.start()
+        return job
+
+    def fail(self, job, error):
+        """Fail a job no frame has been submitted for yet with ``error``; returns False if one already was"""
+        with self._lock:
+            if job.submitted:
+                return False
+            job.submitted = True
+            self.failed += 1
+        job.future.set_exception(error)
+        return True
+
+    def get(self, capture_id):
+        with self._lock:
+            return self._jobs.get(capture_id)
+
+    def submit(self, job, frame, caption, shirt=None):
+        """Hand a rendered frame, its caption lines and the shirt worn to a writer thread.
+
+        Returns False, leaving the frame to the caller, if the job already
+        has a frame or has failed.
+        """
+        with self._lock:
+            if job.submitted:
+                return False
+            job.submitted = True
+        self._executor.submit(self._write, job, frame, caption, shirt)
+        return True
+
+    def _write(self, job, frame, caption, shirt):
+        try:
+            annotate_banner(frame, caption)
+            stamp = datetime.fromtimestamp(job.requested).strftime("%Y%m%d_%H%M%S")
+            filename = f"virtual_tryout_{stamp}_{job.capture_id[:6]}.jpg"
+            ok, encoded = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+            if not ok:
+                raise IOError('Could not encode photo')
+            path = os.path.join(self.folder, filename)
+            # Write then rename so downloads never see a half-written file
+            with open(path + '.part', 'wb') as f:
+                f.write(encoded.tobytes())
+            os.replace(path + '.part', path)
+        except Exception as e:
+            self.failed += 1
+            job.future.set_exception(e)
+        else:
+            self.written += 1
+            job.future.set_result(filename)
+            if self.gallery is not None:
+                try:
+                    self.gallery.add(filename, len(encoded), frame, capture_id=job.capture_id,
+                                     session_id=job.session_id, shirt=shirt, created=job.requested)
+                except Exception:
+                    logger.exception("Could not index photo %s", filename)
+
+    def stats(self):
+        with self._lock:
+            pending = sum(1 for job in self._jobs.values() if not job.future.done())
+        return {'pending': pending, 'written': self.written, 'failed': self.failed}
@@ -0,0 +1,171 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS photos (
+    filename TEXT PRIMARY KEY,
+    capture_id TEXT,
+    session_id TEXT,
+    shirt TEXT,
+    created REAL NOT NULL,
+    size INTEGER NOT NULL,
+    width INTEGER,
+    height INTEGER,
+    thumbnail INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS photos_created ON photos (created);
+CREATE INDEX IF NOT EXISTS photos_session ON photos (session_id, created);
+"""
+
+
+class PhotoGallery:
+    """Index of the captured photos in SQLite, with background thumbnails and retention.
+
+    Listing and lookups read the index instead of walking the folder; call
+    ``sync`` once at start-up to pick up files it does not know. Photos
+    are registered with ``add`` once written; thumbnails are made on a
+    background thread, from the frame still in memory when there is one.
+    After every add the oldest photos are removed while the gallery is over
+    ``max_count`` photos or ``max_bytes``, or older than ``max_age`` seconds
+    (each limit is off when None).
+    """
+
+    def __init__(self, folder, index_path, thumbnail_width=240, max_count=None, max_bytes=None, max_age=None):
+        self.folder = folder
+        self.thumbnail_folder = os.path.join(folder, 'thumbnails')
+        self.thumbnail_width = thumbnail_width
+        self.max_count = max_count
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        os.makedirs(self.thumbnail_folder, exist_ok=True)
+        self._db = sqlite3.connect(index_path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.executescript(SCHEMA)
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(1, thread_name_prefix='photo-thumbnails')
+        self.removed = 0
+
+    def sync(self):
+        """Index photos written before the gallery existed and forget ones deleted by hand"""
+        on_disk = {}
+        with os.scandir(self.folder) as entries:
+            for entry in entries:
+                if entry.is_file() and entry.name.lower().endswith('.jpg'):
+                    stat = entry.stat()
+                    on_disk[entry.name] = (stat.st_mtime, stat.st_size)
+        with self._lock, self._db:
+            indexed = {row[0] for row in self._db.execute('SELECT filename FROM photos')}
+            self._db.executemany('DELETE FROM photos WHERE filename = ?', [(f,) for f in indexed - set(on_disk)])
+            self._db.executemany(
+                'INSERT INTO photos (filename, created, size) VALUES (?, ?, ?)',
+                [(name, *on_disk[name]) for name in sorted(set(on_disk) - indexed)])
+            missing = [row[0] for row in self._db.execute('SELECT filename FROM photos WHERE thumbnail = 0')]
+        for filename in missing:
+            self._executor.submit(self._make_thumbnail, filename, None)
+        self.enforce_retention()
+
+    def add(self, filename, size, image=None, capture_id=None, session_id=None, shirt=None, created=None):
+        """Register a written photo; ``image`` (not modified afterwards) saves re-reading it for the thumbnail"""
+        height, width = image.shape[:2] if image is not None else (None, None)
+        with self._lock, self._db:
+            self._db.execute(
+                'INSERT OR REPLACE INTO photos (filename, capture_id, session_id, shirt, created, size, width, height)'
+                ' VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (filename, capture_id, session_id, shirt, created or time.time(), size, width, height))
+        self._executor.submit(self._make_thumbnail, filename, image)
+        self.enforce_retention()
+
+    def _make_thumbnail(self, filename, image):
+        try:
+            if image is None:
+                image = cv2.imread(os.path.join(self.folder, filename))
+                if image is None:
+                    return
+            height = max(1, round(image.shape[0] * self.thumbnail_width / image.shape[1]))
+            thumbnail = cv2.resize(image, (self.thumbnail_width, height), interpolation=cv2.INTER_AREA)
+            ok, encoded = cv2.imencode('.jpg', thumbnail, [cv2.IMWRITE_JPEG_QUALITY, 80])
+            path = os.path.join(self.thumbnail_folder, filename)
+            with open(path + '.part', 'wb') as f:
+                f.write(encoded.tobytes())
+            os.replace(path + '.part', path)
+            with self._lock, self._db:
+                cursor = self._db.execute(
+                    'UPDATE photos SET thumbnail = 1, width = COALESCE(width, ?), height = COALESCE(height, ?)'
+                    ' WHERE filename = ?', (image.shape[1], image.shape[0], filename))
+            if cursor.rowcount == 0:
+                # Removed by retention meanwhile
+                os.remove(path)
+        except Exception:
+            logger.exception("Thumbnail for %s failed", filename)
+
+    def enforce_retention(self):
+        """Delete the oldest photos beyond the configured limits; returns how many were removed"""
+        with self._lock, self._db:
+            doomed = []
+            if self.max_age is not None:
+                doomed += self._db.execute('SELECT filename, size FROM photos WHERE created < ?',
+                                           (time.time() - self.max_age,)).fetchall()
+            count, total = self._db.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM photos').fetchone()
+            count -= len(doomed)
+            total -= sum(row['size'] for row in doomed)
+            if (self.max_count is not None and count > self.max_count) or \
+                    (self.max_bytes is not None and total > self.max_bytes):
+                oldest = self._db.execute('SELECT filename, size FROM photos WHERE created >= ? ORDER BY created',
+                                          (time.time() - self.max_age if self.max_age is not None else 0,))
+                for row in oldest:
+                    if (self.max_count is None or count <= self.max_count) and \
+                            (self.max_bytes is None or total <= self.max_bytes):
+                        break
+                    doomed.append(row)
+                    count -= 1
+                    total -= row['size']
+            self._db.executemany('DELETE FROM photos WHERE filename = ?', [(row['filename'],) for row in doomed])
+        for row in doomed:
+            for path in (os.path.join(self.folder, row['filename']),
+                         os.path.join(self.thumbnail_folder, row['filename'])):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+        self.removed += len(doomed)
+        return len(doomed)
+
+    def get(self, filename):
+        """The photo's index entry as a dict, or None"""
+        with self._lock:
+            row = self._db.execute('SELECT * FROM photos WHERE filename = ?', (filename,)).fetchone()
+        return dict(row) if row is not None else None
+
+    def list(self, session_id=None, offset=0, limit=50):
+        """Newest first; returns (total, [entry, ...])"""
+        where, args = ('WHERE session_id = ?', (session_id,)) if session_id else ('', ())
+        with self._lock:
+            total = self._db.execute(f'SELECT COUNT(*) FROM photos {where}', args).fetchone()[0]
+            rows = self._db.execute(f'SELECT * FROM photos {where} ORDER BY created DESC, filename DESC'
+                                    ' LIMIT ? OFFSET ?', args + (limit, offset)).fetchall()
+        return total, [dict(row) for row in rows]
+
+    def path(self, filename):
+        return os.path.join(self.folder, filename)
+
+    def thumbnail_path(self, filename):
+        """Path of the photo's thumbnail, made now if the background thread has not got to it yet"""
+        path = os.path.join(self.thumbnail_folder, filename)
+        if not os.path.exists(path):
+            self._make_thumbnail(filename, None)
+        return path if os.path.exists(path) else None
+
+    def stats(self):
+        with self._lock:
+            count, total, thumbnails = self._db.execute(
+                'SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(thumbnail), 0) FROM photos').fetchone()
+        return {'photos': count, 'bytes': total, 'thumbnails': thumbnails, 'removed': self.removed}
@@ -0,0 +1,179 @@
+import threading
+import time
+from collections import deque
+
+
+class LatestFrameQueue:
+    """Bounded queue where a new item pushes out the oldest one (latest frame wins)"""
+
+    def __init__(self, maxsize=1):
+        self._items = deque()
+        self._maxsize = maxsize
+        self._cond = threading.Condition()
+        self._closed = False
+        self.dropped = 0
+
+    def put(self, item):
+        with self._cond:
+            if len(self._items) >= self._maxsize:
+                self._items.popleft()
+                self.dropped += 1
+            self._items.append(item)
+            self._cond.notify()
+
+    def get(self, timeout=None):
+        """Return the oldest queued item, or None on timeout or once closed and empty"""
+        with self._cond:
+            if not self._items and not self._closed:
+                self._cond.wait(timeout)
+            return self._items.popleft() if self._items else None
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def __len__(self):
+        return len(self._items)
+
+
+class StageStats:
+    """Processed count, average and last duration of one pipeline stage"""
+
+    __slots__ = ('processed', 'total_time', 'last_time')
+
+    def __init__(self):
+        self.processed = 0
+        self.total_time = 0.0
+        self.last_time = 0.0
+
+    def record(self, elapsed):
+        self.processed += 1
+        self.total_time += elapsed
+        self.last_time = elapsed
+
+    def as_dict(self):
+        average = self.total_time / self.processed if self.processed else 0.0
+        return {
+            'processed': self.processed,
+            'avg_ms': round(average * 1000, 2),
+            'last_ms': round(self.last_time * 1000, 2),
+        }
+
+
+class FramePipeline:
+    """Capture, inference and compose/encode stages on their own threads.
+
+    Stages are joined by ``LatestFrameQueue``s, so a slow stage makes the one
+    before it drop stale frames instead of building up latency. ``capture``
+    returns a frame or None at end of stream, ``infer(frame)`` returns model
+    results and ``compose(frame, results)`` draws and encodes the output
+    handed to ``get``, or to ``sink(payload)`` when given.
+    ``sink(None)`` is called once the pipeline ends, after ``close()`` has
+    released the capture source on the capture thread.
+    """
+
+    STAGES = ('capture', 'inference', 'compose')
+
+    def __init__(self, capture, infer, compose, sink=None, close=None, queue_size=1):
+        self._capture = capture
+        self._sink = sink
+        self._close = close
+        self._infer = infer
+        self._compose = compose
+        self.infer_queue = LatestFrameQueue(queue_size)
+        self.compose_queue = LatestFrameQueue(queue_size)
+        self.output_queue = LatestFrameQueue(queue_size)
+        self.stage_stats = {name: StageStats() for name in self.STAGES}
+        self.latency = 0.0
+        self.fps = 0.0
+        self._stop = threading.Event()
+        self._threads = []
+
+    @property
+    def running(self):
+        return not self._stop.is_set()
+
+    def start(self):
+        for name, target in zip(self.STAGES, (self._capture_loop, self._inference_loop, self._compose_loop)):
+            thread = threading.Thread(target=target, name=f'pipeline-{name}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def stop(self, timeout=2.0):
+        self._stop.set()
+        for queue in (self.infer_queue, self.compose_queue, self.output_queue):
+            queue.close()
+        for thread in self._threads:
+            if thread is not threading.current_thread():
+                thread.join(timeout)
+
+    def get(self, timeout=None):
+        """Return the next encoded frame, or None if none arrived in time"""
+        item = self.output_queue.get(timeout)
+        return None if item is None else item[1]
+
+    def _capture_loop(self):
+        stats = self.stage_stats['capture']
+        while not self._stop.is_set():
+            start = time.perf_counter()
+            frame = self._capture()
+            if frame is None:
+                break
+            captured_at = time.perf_counter()
+            stats.record(captured_at - start)
+            self.infer_queue.put((captured_at, frame))
+        if self._close is not None:
+            self._close()
+        self.stop(timeout=0)
+        if self._sink is not None:
+            self._sink(None)
+
+    def _inference_loop(self):
+        stats = self.stage_stats['inference']
+        while not self._stop.is_set():
+            item = self.infer_queue.get(0.5)
+            if item is None:
+                continue
+            captured_at, frame = item
+            start = time.perf_counter()
+            results = self._infer(frame)
+            stats.record(time.perf_counter() - start)
+            self.compose_queue.put((captured_at, frame, results))
+
+    def _compose_loop(self):
+        stats = self.stage_stats['compose']
+        last_output = None
+        while not self._stop.is_set():
+            item = self.compose_queue.get(0.5)
+            if item is None:
+                continue
+            captured_at, frame, results = item
+            start = time.perf_counter()
+            payload = self._compose(frame, results)
+            done = time.perf_counter()
+            stats.record(done - start)
+            if self._sink is not None:
+                self._sink(payload)
+            else:
+                self.output_queue.put((captured_at, payload))
+            self.latency = 0.9 * self.latency + 0.1 * (done - captured_at) if self.latency else done - captured_at
+            if last_output is not None:
+                instant = 1.0 / max(done - last_output, 1e-6)
+                self.fps = 0.9 * self.fps + 0.1 * instant if self.fps else instant
+            last_output = done
+
+    def stats(self):
+        queues = {'inference': self.infer_queue, 'compose': self.compose_queue, 'output': self.output_queue}
+        stages = {}
+        for name, stats in self.stage_stats.items():
+            stages[name] = stats.as_dict()
+        for name, queue in queues.items():
+            stages.setdefault(name, {}).update({'queue_depth': len(queue), 'dropped': queue.dropped})
+        return {
+            'running': self.running,
+            'fps': round(self.fps, 1),
+            'latency_ms': round(self.latency * 1000, 1),
+            'stages': stages,
+        }
@@ -0,0 +1,106 @@
+import re
+import threading
+import time
+import uuid
+
+from landmark_filter import LandmarkTracker
+
+SESSION_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+
+
+class TryOnSession:
+    """Try-on state for one kiosk or client stream; mutate it while holding ``lock``"""
+
+    __slots__ = (
+        'session_id', 'lock', 'changed', 'version', 'created', 'last_seen',
+        'image_number', 'tracker', 'counter_left', 'counter_right',
+        'cart_items', 'camera_active', 'fit_detection', 'tracking_quality',
+        'gesture_detected', 'last_gesture_time', 'show_pose_landmarks', 'overlay_opacity',
+        'capture_requested', 'shirt_overlay_active', 'last_captured_photo', 'last_rendered',
+        'metrics_notified',
+    )
+
+    def __init__(self, session_id, smoothing='average'):
+        self.session_id = session_id
+        self.lock = threading.RLock()
+        self.changed = threading.Condition(self.lock)
+        self.version = 0
+        self.created = self.last_seen = time.monotonic()
+        self.image_number = 0
+        # Smoothed shoulder and hip positions (see landmark_filter.py)
+        self.tracker = LandmarkTracker(mode=smoothing)
+        self.counter_left = 0
+        self.counter_right = 0
+        self.cart_items = []
+        self.camera_active = True
+        self.fit_detection = 85
+        self.tracking_quality = 80
+        # When a fit/tracking change last woke the status streams (monotonic)
+        self.metrics_notified = 0.0
+        self.gesture_detected = None
+        self.last_gesture_time = 0
+        self.show_pose_landmarks = True
+        self.overlay_opacity = 0.8
+        # Pending CaptureJob picked up by the next rendered frame
+        self.capture_requested = None
+        self.shirt_overlay_active = True
+        self.last_captured_photo = None
+        # When draw_frame last rendered this session (monotonic, 0 if never)
+        self.last_rendered = 0.0
+
+    def touch(self):
+        self.last_seen = time.monotonic()
+
+    def mark_changed(self):
+        """Wake status streams: call after changing state the page shows"""
+        with self.changed:
+            self.version += 1
+            self.changed.notify_all()
+
+    def wait_for_change(self, version, timeout=None):
+        """Block until the state version differs from ``version`` or ``timeout`` passes; returns the version"""
+        with self.changed:
+            if self.version == version:
+                self.changed.wait(timeout)
+            return self.version
+
+
+class SessionStore:
+    """Sessions keyed by id, dropped after ``ttl`` seconds without use"""
+
+    def __init__(self, ttl=30 * 60, sweep_interval=60, smoothing='average'):
+        self.ttl = ttl
+        self.sweep_interval = sweep_interval
+        self.smoothing = smoothing
+        self._sessions = {}
+        self._lock = threading.Lock()
+        self._last_sweep = time.monotonic()
+
+    @staticmethod
+    def valid_id(session_id):
+        return bool(session_id) and SESSION_ID_PATTERN.match(session_id) is not None
+
+    def get(self, session_id=None):
+        """Return the session for session_id, creating it (with a fresh id if invalid) when missing"""
+        self._sweep()
+        if not self.valid_id(session_id):
+            session_id = uuid.uuid4().hex
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = self._sessions[session_id] = TryOnSession(session_id, self.smoothing)
+        session.touch()
+        return session
+
+    def _sweep(self):
+        now = time.monotonic()
+        if now - self._last_sweep < self.sweep_interval:
+            return
+        self._last_sweep = now
+        with self._lock:
+            expired = [sid for sid, session in self._sessions.items() if now - session.last_seen > self.ttl]
+            for sid in expired:
+                del self._sessions[sid]
+
+    def __len__(self):
+        return len(self._sessions)
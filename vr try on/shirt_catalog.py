@@ -0,0 +1,162 @@
+import hashlib
+import os
+import threading
+import time
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.webp')
+
+
+def garment_id(filename):
+    """Stable id for a garment file: the same name always gets the same id, across rescans and restarts"""
+    return int(hashlib.sha1(filename.encode()).hexdigest()[:8], 16) & 0x7fffffff
+
+
+class ShirtCatalog:
+    """The garment images in a folder as inventory items, indexed by position, id, filename and brand.
+
+    ``make_item(item_id, filename)`` builds the item dict for a garment; ids
+    come from ``garment_id`` and never change while the file exists, so
+    carts and clients can hold on to them. Positions (``get``) are only for
+    stepping through the catalog. At most every ``check_interval`` seconds
+    the folder's mtime and every garment file's mtime and size are checked;
+    when the folder changes new files are appended, existing files keep
+    their order and removed files are dropped. ``version`` changes whenever
+    the folder or any garment file does, including a file overwritten in
+    place (which leaves the folder's mtime alone).
+    """
+
+    def __init__(self, folder, make_item, check_interval=1.0):
+        self.folder = folder
+        self._make_item = make_item
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._folder_mtime = None
+        self._signatures = {}
+        self._last_check = 0.0
+        self._filenames = ()
+        self._items = ()
+        self._by_filename = {}
+        self._by_id = {}
+        self._positions = {}
+        self._by_brand = {}
+        self.version = 0
+        self.etag = ''
+        self.refresh(force=True)
+
+    def refresh(self, force=False):
+        """Rescan the folder if its mtime changed; returns True if the list of items changed"""
+        now = time.monotonic()
+        if not force and now - self._last_check < self.check_interval:
+            return False
+        self._last_check = now
+        try:
+            mtime = os.stat(self.folder).st_mtime_ns
+        except OSError:
+            mtime = None
+        with self._lock:
+            changed = False
+            if mtime != self._folder_mtime or force:
+                self._folder_mtime = mtime
+                changed = self._rescan()
+            signatures = self._stat_files()
+            if changed or signatures != self._signatures or force:
+                self._signatures = signatures
+                self.version += 1
+            return changed
+
+    def _stat_files(self):
+        """(mtime, size) of every garment file, to notice files overwritten in place"""
+        signatures = {}
+        for filename in self._filenames:
+            try:
+                st = os.stat(os.path.join(self.folder, filename))
+            except OSError:
+                continue
+            signatures[filename] = (st.st_mtime_ns, st.st_size)
+        return signatures
+
+    def _rescan(self):
+        try:
+            names = {name for name in os.listdir(self.folder)
+                     if name.lower().endswith(IMAGE_EXTENSIONS) and not name.startswith('.')}
+        except OSError:
+            names = set()
+        kept = [name for name in self._filenames if name in names]
+        filenames = tuple(kept + sorted(names.difference(kept)))
+        if filenames == self._filenames:
+            return False
+        items, by_id, by_brand = [], {}, {}
+        for filename in filenames:
+            item = self._by_filename.get(filename)
+            if item is None:
+                item_id = garment_id(filename)
+                while item_id in by_id:
+                    # Hash collision: files already listed keep theirs
+                    item_id = (item_id + 1) & 0x7fffffff
+                item = self._make_item(item_id, filename)
+            items.append(item)
+            by_id[item['id']] = item
+            by_brand.setdefault(item['brand'].lower(), []).append(item)
+        # Readers use these without the lock, so they are swapped in, never mutated
+        self._filenames = filenames
+        self._items = tuple(items)
+        self._by_filename = {item['filename']: item for item in items}
+        self._by_id = by_id
+        self._positions = {item['id']: position for position, item in enumerate(items)}
+        self._by_brand = by_brand
+        self.etag = hashlib.sha1('\n'.join(filenames).encode()).hexdigest()[:16]
+        return True
+
+    def __len__(self):
+        self.refresh()
+        return len(self._items)
+
+    def items(self):
+        self.refresh()
+        return self._items
+
+    def filenames(self):
+        self.refresh()
+        return self._filenames
+
+    def get(self, position):
+        """The item at this position, or None"""
+        items = self.items()
+        return items[position] if 0 <= position < len(items) else None
+
+    def filename(self, position):
+        item = self.get(position)
+        return item['filename'] if item is not None else None
+
+    def by_id(self, item_id):
+        """The item with this id, or None"""
+        self.refresh()
+        return self._by_id.get(item_id)
+
+    def position(self, item_id):
+        """Current position of the item with this id, or None"""
+        self.refresh()
+        return self._positions.get(item_id)
+
+    def find(self, filename):
+        """The item for a garment file, or None"""
+        self.refresh()
+        return self._by_filename.get(filename)
+
+    def brands(self):
+        self.refresh()
+        return sorted({item['brand'] for item in self._items})
+
+    def query(self, brand=None, min_price=None, max_price=None, offset=0, limit=None):
+        """Filter by brand (case-insensitive) and price range; returns (total matches, page of items)"""
+        self.refresh()
+        items = self._by_brand.get(brand.lower(), ()) if brand else self._items
+        if min_price is not None or max_price is not None:
+            low = float('-inf') if min_price is None else min_price
+            high = float('inf') if max_price is None else max_price
+            items = [item for item in items if low <= item['price'] <= high]
+        end = None if limit is None else offset + limit
+        return len(items), list(items[offset:end])
+
+    def stats(self):
+        return {'garments': len(self._items), 'brands': len(self._by_brand), 'version': self.version}
@@ -0,0 +1,91 @@
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class Startup:
+    """Runs the slow start-up steps on a background thread so the server can answer meanwhile.
+
+    ``steps`` is a list of (name, function) run in order; the first one that
+    raises stops the sequence and sets ``error``, and ``retry`` resumes from
+    that step. ``report`` gives the state and the time each step took, for
+    the readiness endpoint.
+    """
+
+    def __init__(self, steps):
+        self.steps = steps
+        self.created = time.monotonic()
+        self._ready = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._timings = {}
+        self._current = None
+        self._next_step = 0
+        self.error = None
+        self.attempts = 0
+
+    def start(self):
+        """Start the steps once; later calls do nothing"""
+        with self._lock:
+            if self._thread is None:
+                self._launch()
+
+    def retry(self):
+        """Resume from the step that failed; returns False unless start-up had failed"""
+        with self._lock:
+            if self.error is None or self._thread.is_alive():
+                return False
+            self.error = None
+            self._launch()
+            return True
+
+    def _launch(self):
+        self.attempts += 1
+        self._thread = threading.Thread(target=self._run, name='startup', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        for index in range(self._next_step, len(self.steps)):
+            name, step = self.steps[index]
+            self._current = name
+            start = time.perf_counter()
+            try:
+                step()
+            except Exception as e:
+                self.error = f"{name}: {e}"
+                logger.exception("Start-up step %s failed", name)
+                return
+            finally:
+                self._timings[name] = round(time.perf_counter() - start, 3)
+            self._next_step = index + 1
+        self._current = None
+        self._ready.set()
+
+    @property
+    def ready(self):
+        return self._ready.is_set()
+
+    @property
+    def failed(self):
+        return self.error is not None
+
+    def wait(self, timeout=None):
+        return self._ready.wait(timeout)
+
+    def report(self):
+        if self.ready:
+            status = 'ready'
+        elif self.error is not None:
+            status = 'failed'
+        else:
+            status = 'starting' if self._thread is not None else 'not started'
+        return {
+            'status': status,
+            'current_step': self._current if status == 'starting' else None,
+            'error': self.error,
+            'attempts': self.attempts,
+            'steps': [{'name': name, 'seconds': self._timings.get(name)} for name, _ in self.steps],
+            'uptime': round(time.monotonic() - self.created, 3),
+        }
@@ -0,0 +1,110 @@
+from collections import namedtuple
+
+import cv2
+
+FORMATS = {
+    'jpeg': ('.jpg', cv2.IMWRITE_JPEG_QUALITY, b'image/jpeg'),
+    'webp': ('.webp', cv2.IMWRITE_WEBP_QUALITY, b'image/webp'),
+}
+
+
+class EncodingProfile(namedtuple('EncodingProfile', ['format', 'quality', 'width'])):
+    """How one viewer wants the stream encoded; width None keeps the camera resolution"""
+
+    @classmethod
+    def from_args(cls, args, default_quality=80):
+        """Build a profile from request args (format, quality, width); raises ValueError if invalid"""
+        fmt = args.get('format', 'jpeg').lower()
+        if fmt not in FORMATS:
+            raise ValueError(f"Unsupported format: {fmt}")
+        quality = int(args.get('quality', default_quality))
+        if not 10 <= quality <= 100:
+            raise ValueError('quality must be between 10 and 100')
+        width = args.get('width')
+        width = int(width) if width else None
+        if width is not None and not 160 <= width <= 3840:
+            raise ValueError('width must be between 160 and 3840')
+        return cls(fmt, quality, width)
+
+
+class EncodedFrame:
+    """An encoded frame as multipart chunks, shared by every viewer with the same profile"""
+
+    __slots__ = ('header', 'body')
+
+    boundary = b'--frame\r\n'
+    trailer = b'\r\n'
+
+    def __init__(self, content_type, body):
+        self.body = body
+        self.header = (self.boundary + b'Content-Type: ' + content_type +
+                       b'\r\nContent-Length: ' + str(len(body)).encode() + b'\r\n\r\n')
+
+    def chunks(self):
+        return (self.header, self.body, self.trailer)
+
+
+class FrameEncoder:
+    """Encodes one rendered frame for every requested profile.
+
+    Each distinct profile is encoded once per frame no matter how many
+    viewers use it, and downscaled frames are written into per-size buffers
+    that are reused from frame to frame. Not thread-safe: use one per
+    compose thread.
+    """
+
+    def __init__(self):
+        self._scaled = {}
+
+    def _scale(self, image, width):
+        height, frame_width = image.shape[:2]
+        if width is None or width >= frame_width:
+            return image
+        size = (width, max(1, round(height * width / frame_width)))
+        buffer = cv2.resize(image, size, dst=self._scaled.get(size), interpolation=cv2.INTER_AREA)
+        self._scaled[size] = buffer
+        return buffer
+
+    def encode(self, image, profiles):
+        """Return {profile: EncodedFrame} for the given profiles"""
+        outputs = {}
+        for profile in profiles:
+            extension, quality_flag, content_type = FORMATS[profile.format]
+            ok, buffer = cv2.imencode(extension, self._scale(image, profile.width), [quality_flag, profile.quality])
+            if ok:
+                # WSGI servers only accept bytes, so this is the one copy per profile
+                outputs[profile] = EncodedFrame(content_type, buffer.tobytes())
+        return outputs
+
+
+class AdaptiveQuality:
+    """Lowers a viewer's quality while it keeps skipping frames and restores it once it keeps up.
+
+    Quality moves in steps of ``step`` so slowed-down viewers still tend to
+    share encodes with each other.
+    """
+
+    def __init__(self, profile, step=10, floor=30, recover_after=90):
+        self.requested = profile
+        self.profile = profile
+        self.step = step
+        self.floor = floor
+        self.recover_after = recover_after
+        self._last_skipped = 0
+        self._clean_frames = 0
+
+    def update(self, skipped):
+        """Feed the subscriber's skipped-frame counter after each delivered frame; returns the profile to use"""
+        quality = self.profile.quality
+        if skipped > self._last_skipped:
+            self._clean_frames = 0
+            quality = max(min(self.floor, self.requested.quality), quality - self.step)
+        else:
+            self._clean_frames += 1
+            if self._clean_frames >= self.recover_after and quality < self.requested.quality:
+                self._clean_frames = 0
+                quality = min(self.requested.quality, quality + self.step)
+        self._last_skipped = skipped
+        if quality != self.profile.quality:
+            self.profile = self.profile._replace(quality=quality)
+        return self.profile
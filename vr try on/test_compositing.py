@@ -0,0 +1,61 @@
+import cv2
+import numpy as np
+
+from compositing import composite, prepare_garment
+from garment_cache import premultiply_alpha
+
+
+def reference_overlay(background, overlay, x, y):
+    """The original float blend from app.overlay_image_alpha, for a garment that fits the frame"""
+    h, w = overlay.shape[:2]
+    mask = overlay[..., 3:] / 255.0
+    background[y:y + h, x:x + w] = (1.0 - mask) * background[y:y + h, x:x + w] + mask * overlay[..., :3]
+    return background
+
+
+def random_garment(rng, height=60, width=40):
+    garment = rng.integers(0, 256, (height, width, 4), dtype=np.uint8)
+    # Fully transparent border, as in the shirt PNGs, so the crop to visible pixels is exercised
+    garment[:5, :, 3] = 0
+    garment[:, -7:, 3] = 0
+    garment[10:20, 10:20, 3] = 255
+    return garment
+
+
+def test_blend_matches_reference_overlay():
+    rng = np.random.default_rng(0)
+    frame = rng.integers(0, 256, (120, 160, 3), dtype=np.uint8)
+    garment = random_garment(rng)
+
+    expected = reference_overlay(frame.copy(), garment, 30, 25)
+    result = composite(frame.copy(), prepare_garment(premultiply_alpha(garment)), 30, 25)
+
+    # Fixed point rounds where the float version truncates
+    assert np.abs(result.astype(int) - expected.astype(int)).max() <= 2
+
+
+def test_opaque_and_transparent_pixels_are_exact():
+    rng = np.random.default_rng(1)
+    frame = rng.integers(0, 256, (120, 160, 3), dtype=np.uint8)
+    garment = random_garment(rng)
+
+    result = composite(frame.copy(), prepare_garment(premultiply_alpha(garment)), 30, 25)
+
+    assert np.array_equal(result[35:45, 40:50], garment[10:20, 10:20, :3])
+    assert np.array_equal(result[25:30, 30:70], frame[25:30, 30:70])
+    assert np.array_equal(result[:25], frame[:25])
+
+
+def test_garment_partly_outside_the_frame_is_clipped():
+    rng = np.random.default_rng(2)
+    frame = rng.integers(0, 256, (120, 160, 3), dtype=np.uint8)
+    garment = random_garment(rng)
+    prepared = prepare_garment(premultiply_alpha(garment))
+
+    # Blend onto a padded canvas where the garment fits, then cut the frame back out
+    padded = cv2.copyMakeBorder(frame, 100, 100, 100, 100, cv2.BORDER_CONSTANT)
+    expected = composite(padded, prepared, 100 - 20, 100 + 90)[100:-100, 100:-100]
+    result = composite(frame.copy(), prepared, -20, 90)
+
+    assert np.array_equal(result, expected)
+    assert np.array_equal(composite(frame.copy(), prepared, 500, 500), frame)
@@ -0,0 +1,69 @@
+import os
+
+import cv2
+import numpy as np
+import pytest
+
+from garment_cache import GarmentCache
+from shirt_catalog import ShirtCatalog
+
+
+def write_garment(folder, name, colour, size=(40, 30)):
+    image = np.zeros((size[1], size[0], 4), dtype=np.uint8)
+    image[:] = (*colour, 255)
+    cv2.imwrite(os.path.join(folder, name), image)
+
+
+@pytest.fixture
+def folder(tmp_path):
+    for index, name in enumerate(['a.png', 'b.png', 'c.png']):
+        write_garment(tmp_path, name, (index * 50, 0, 0))
+    return str(tmp_path)
+
+
+def test_garment_overwritten_in_place_is_reloaded(folder):
+    catalog = ShirtCatalog(folder, lambda item_id, filename: {'id': item_id, 'filename': filename, 'brand': ''},
+                           check_interval=0)
+    cache = GarmentCache(folder)
+    cache.track(catalog.version)
+    assert cache.master('a.png')[0, 0, 0] == 0
+    folder_mtime = os.stat(folder).st_mtime_ns
+
+    # Written over the same inode, bigger, so the size changes even if the mtime does not
+    write_garment(folder, 'a.png', (200, 0, 0), size=(48, 36))
+    assert os.stat(folder).st_mtime_ns == folder_mtime
+    catalog.refresh()
+    cache.track(catalog.version)
+    assert cache.master('a.png')[0, 0, 0] == 200
+
+
+def test_masters_stay_within_their_budget(folder):
+    one = 40 * 30 * 4
+    cache = GarmentCache(folder, max_master_bytes=2 * one)
+    cache.master('a.png')
+    cache.master('b.png')
+    cache.master('a.png')
+    cache.master('c.png')
+    # b.png was the least recently used
+    assert cache.stats()['garments'] == 2
+    assert cache.stats()['master_bytes'] == 2 * one
+    assert list(cache._masters) == ['a.png', 'c.png']
+
+
+def test_variants_are_evicted_least_recently_used_first(folder):
+    cache = GarmentCache(folder, quantum=1)
+    variant_bytes = cache.get('a.png', 20, 20).nbytes
+    cache.max_bytes = 2 * variant_bytes
+    cache.get('b.png', 20, 20)
+    assert cache.get('a.png', 20, 20) is not None
+    cache.get('c.png', 20, 20)
+    stats = cache.stats()
+    assert stats['variants'] == 2 and stats['evictions'] == 1
+    assert stats['variant_bytes'] <= cache.max_bytes
+    assert ('b.png', 20, 20) not in cache._variants
+
+
+def test_preload_stops_at_the_master_budget(folder):
+    cache = GarmentCache(folder, max_master_bytes=40 * 30 * 4)
+    cache.preload(['a.png', 'b.png', 'c.png'])
+    assert cache.stats()['garments'] == 1
@@ -0,0 +1,67 @@
+import time
+
+import numpy as np
+import pytest
+
+from inference_scheduler import InferenceResult
+from inference_workers import InferenceWorkerPool
+from metrics import Metrics
+
+
+class FakeEngine:
+    """Answers every frame with a pose holding the frame's mean, without loading any model"""
+
+    def __init__(self, metrics=None, delay=0.0):
+        self.metrics = metrics
+        self.delay = delay
+
+    def __call__(self, image):
+        time.sleep(self.delay)
+        self.metrics.observe('pose', 0.001)
+        return InferenceResult(np.full((33, 4), image.mean(), dtype=np.float32), pose_fresh=True)
+
+    def stats(self):
+        return {}
+
+    def close(self):
+        pass
+
+
+def create_fake_engine(metrics=None, delay=0.0):
+    return FakeEngine(metrics, delay)
+
+
+@pytest.fixture
+def pool():
+    pool = InferenceWorkerPool(create_fake_engine, workers=1, engine_options={'delay': 0.2},
+                               slot_bytes=64 * 64 * 3, timeout=3.0, metrics=Metrics())
+    yield pool
+    pool.close()
+
+
+def frame(value):
+    return np.full((64, 64, 3), value, dtype=np.uint8)
+
+
+def test_results_and_stage_timings_come_back(pool):
+    engine = pool.engine()
+    assert engine(frame(7)).pose[0, 0] == 7
+    assert pool.metrics.stage_summary()['pose']['count'] == 1
+
+
+def test_killed_worker_fails_in_flight_frames_and_is_replaced(pool):
+    engine = pool.engine()
+    engine(frame(1))
+    in_flight = engine.submit(frame(2))
+    process = pool.stats()['workers'][0]
+    pool._workers[0].process.kill()
+    pool._workers[0].process.join()
+
+    start = time.monotonic()
+    with pytest.raises(RuntimeError):
+        in_flight.result(timeout=3.0)
+    # The next frame goes to a new worker instead of waiting on the dead one's slots
+    assert engine(frame(3)).pose[0, 0] == 3
+    assert time.monotonic() - start < 3.0
+    assert pool.stats()['restarts'] == 1
+    assert pool.stats()['workers'][0]['pid'] != process['pid']
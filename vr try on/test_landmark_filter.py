@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+from landmark_filter import LandmarkTracker, PLACEMENT_LANDMARKS, FILTERS
+from landmarks import LEFT_SHOULDER
+
+FPS = 30.0
+FRAMES = 300
+WIDTH, HEIGHT = 1280, 720
+
+
+def track(positions, noise_px=2.0, seed=0):
+    """Poses whose left shoulder follows ``positions`` (pixels) plus detector noise"""
+    rng = np.random.default_rng(seed)
+    poses = np.zeros((len(positions), 33, 4), dtype=np.float32)
+    poses[:, :, 3] = 1
+    poses[:, :, 0] = 0.5
+    poses[:, :, 1] = 0.4
+    poses[:, LEFT_SHOULDER, 0] = (positions + rng.normal(0, noise_px, len(positions))) / WIDTH
+    return poses
+
+
+def smooth(mode, poses):
+    tracker = LandmarkTracker(PLACEMENT_LANDMARKS, mode=mode)
+    return np.array([tracker.update(pose, WIDTH, HEIGHT, i / FPS)[0, 0] for i, pose in enumerate(poses)])
+
+
+def jitter(output):
+    """RMS frame-to-frame acceleration, after the filter has settled"""
+    return np.sqrt(np.mean(np.diff(output[30:], 2) ** 2))
+
+
+def lag(output, truth, max_lag=10):
+    errors = [np.mean((output[30 + k:] - truth[30:len(truth) - k]) ** 2) for k in range(max_lag)]
+    return int(np.argmin(errors))
+
+
+STILL = np.full(FRAMES, 600.0)
+SWAY = 600 + 40 * np.sin(2 * np.pi * 0.3 * np.arange(FRAMES) / FPS)
+STEP = 600 + 200 * np.clip((np.arange(FRAMES) / FPS - 5) / 0.2, 0, 1)
+
+
+@pytest.mark.parametrize('mode', ['one_euro', 'kalman'])
+def test_less_jitter_than_moving_average_when_still(mode):
+    poses = track(STILL)
+    assert jitter(smooth(mode, poses)) < jitter(smooth('average', poses))
+
+
+@pytest.mark.parametrize('mode', list(FILTERS))
+@pytest.mark.parametrize('truth', [SWAY, STEP], ids=['sway', 'step'])
+def test_lag_is_bounded(mode, truth):
+    assert lag(smooth(mode, track(truth)), truth) <= 2
+
+
+@pytest.mark.parametrize('mode', list(FILTERS))
+def test_restarts_after_losing_the_pose(mode):
+    tracker = LandmarkTracker(PLACEMENT_LANDMARKS, mode=mode, reset_after=1.0)
+    far, near = track(np.full(5, 200.0), noise_px=0), track(np.full(1, 900.0), noise_px=0)
+    for i, pose in enumerate(far):
+        tracker.update(pose, WIDTH, HEIGHT, i / FPS)
+    # Two seconds without a pose: the next one is taken as is, not blended with the old position
+    assert tracker.update(near[0], WIDTH, HEIGHT, 3.0)[0, 0] == pytest.approx(900.0, abs=0.01)
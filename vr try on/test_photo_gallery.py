@@ -0,0 +1,65 @@
+import os
+import time
+
+import numpy as np
+import pytest
+
+from photo_gallery import PhotoGallery
+
+
+@pytest.fixture
+def folder(tmp_path):
+    photos = tmp_path / 'photos'
+    photos.mkdir()
+    return photos
+
+
+def add_photo(gallery, name, size, created):
+    with open(os.path.join(gallery.folder, name), 'wb') as f:
+        f.write(b'\0' * size)
+    gallery.add(name, size, np.zeros((8, 8, 3), dtype=np.uint8), created=created)
+
+
+def names(gallery):
+    return sorted(entry['filename'] for entry in gallery.list(limit=100)[1])
+
+
+def on_disk(folder):
+    return sorted(name for name in os.listdir(folder) if name.endswith('.jpg'))
+
+
+def test_photos_older_than_max_age_are_removed(folder, tmp_path):
+    gallery = PhotoGallery(str(folder), str(tmp_path / 'index.sqlite3'), max_age=3600)
+    now = time.time()
+    add_photo(gallery, 'old.jpg', 10, now - 7200)
+    add_photo(gallery, 'new.jpg', 10, now)
+    assert names(gallery) == ['new.jpg']
+    assert on_disk(folder) == ['new.jpg']
+    assert gallery.removed == 1
+
+
+def test_oldest_photos_go_beyond_max_count(folder, tmp_path):
+    gallery = PhotoGallery(str(folder), str(tmp_path / 'index.sqlite3'), max_count=2)
+    now = time.time()
+    for index in range(4):
+        add_photo(gallery, f'{index}.jpg', 10, now + index)
+    assert names(gallery) == ['2.jpg', '3.jpg']
+    assert on_disk(folder) == ['2.jpg', '3.jpg']
+
+
+def test_oldest_photos_go_beyond_max_bytes(folder, tmp_path):
+    gallery = PhotoGallery(str(folder), str(tmp_path / 'index.sqlite3'), max_bytes=250)
+    now = time.time()
+    for index in range(4):
+        add_photo(gallery, f'{index}.jpg', 100, now + index)
+    assert names(gallery) == ['2.jpg', '3.jpg']
+    assert gallery.stats()['bytes'] == 200
+    assert on_disk(folder) == ['2.jpg', '3.jpg']
+
+
+def test_sync_indexes_files_written_before_the_gallery(folder, tmp_path):
+    (folder / 'a.jpg').write_bytes(b'\0' * 10)
+    gallery = PhotoGallery(str(folder), str(tmp_path / 'index.sqlite3'))
+    assert names(gallery) == []
+    gallery.sync()
+    assert names(gallery) == ['a.jpg']
@@ -0,0 +1,113 @@
+import os
+
+import cv2
+import numpy as np
+import pytest
+
+from shirt_catalog import ShirtCatalog
+
+NAMES = ['nike_red.png', 'nike_blue.png', 'adidas_black.png', 'zara_white.png', 'gap_green.png']
+
+
+def write_garment(folder, name):
+    cv2.imwrite(os.path.join(folder, name), np.full((8, 8, 4), 255, dtype=np.uint8))
+
+
+def make_item(item_id, filename):
+    return {'id': item_id, 'filename': filename, 'brand': filename.split('_')[0].title(),
+            'price': 10.0 * (NAMES.index(filename) + 1) if filename in NAMES else 99.0}
+
+
+@pytest.fixture
+def folder(tmp_path):
+    for name in NAMES:
+        write_garment(tmp_path, name)
+    return str(tmp_path)
+
+
+def test_ids_survive_other_files_coming_and_going(folder):
+    catalog = ShirtCatalog(folder, make_item, check_interval=0)
+    ids = {item['filename']: item['id'] for item in catalog.items()}
+
+    os.remove(os.path.join(folder, 'nike_blue.png'))
+    write_garment(folder, 'puma_grey.png')
+    catalog.refresh(force=True)
+
+    assert catalog.by_id(ids['nike_blue.png']) is None
+    for name in ('nike_red.png', 'adidas_black.png', 'zara_white.png', 'gap_green.png'):
+        assert catalog.find(name)['id'] == ids[name]
+        assert catalog.get(catalog.position(ids[name]))['filename'] == name
+    # Existing files keep their order, new ones go to the end
+    assert catalog.filenames()[-1] == 'puma_grey.png'
+
+    # A fresh catalog over the same folder (a restart) hands out the same ids
+    restarted = ShirtCatalog(folder, make_item)
+    assert {item['filename']: item['id'] for item in restarted.items()} == \
+        {item['filename']: item['id'] for item in catalog.items()}
+
+
+def test_query_filters_by_brand_and_price_and_pages(folder):
+    catalog = ShirtCatalog(folder, make_item)
+
+    total, items = catalog.query(brand='NIKE')
+    assert total == 2 and {item['filename'] for item in items} == {'nike_red.png', 'nike_blue.png'}
+    total, items = catalog.query(min_price=20, max_price=40)
+    assert total == 3 and sorted(item['price'] for item in items) == [20.0, 30.0, 40.0]
+    total, items = catalog.query(brand='nike', max_price=15)
+    assert total == 1 and items[0]['filename'] == 'nike_red.png'
+
+    total, page = catalog.query(offset=1, limit=2)
+    assert total == len(NAMES) and page == list(catalog.items()[1:3])
+    assert catalog.query(offset=10, limit=2) == (len(NAMES), [])
+
+
+@pytest.fixture
+def inventory(folder, tmp_path_factory, monkeypatch):
+    """The app's /api/inventory view over the test folder"""
+    monkeypatch.setenv('TRYON_PHOTO_INDEX', str(tmp_path_factory.mktemp('index') / 'photos.sqlite3'))
+    import app
+    monkeypatch.setattr(app, 'catalog', ShirtCatalog(folder, app.make_shirt_info))
+
+    def get(query='', headers=None):
+        with app.app.test_request_context(f'/api/inventory{query}', headers=headers or {}):
+            return app.app.make_response(app.get_inventory())
+    get.catalog = app.catalog
+    return get
+
+
+def test_inventory_answers_304_while_the_etag_matches(inventory, folder):
+    first = inventory()
+    assert first.status_code == 200 and first.headers['ETag']
+    assert int(first.headers['X-Total-Count']) == len(NAMES)
+
+    again = inventory(headers={'If-None-Match': first.headers['ETag']})
+    assert again.status_code == 304 and again.headers['ETag'] == first.headers['ETag']
+    # A different query is a different resource
+    assert inventory('?brand=nike', headers={'If-None-Match': first.headers['ETag']}).status_code == 200
+
+    write_garment(folder, 'puma_grey.png')
+    inventory.catalog.refresh(force=True)
+    changed = inventory(headers={'If-None-Match': first.headers['ETag']})
+    assert changed.status_code == 200 and changed.headers['ETag'] != first.headers['ETag']
+
+
+def test_inventory_filters_and_pages_with_total_count(inventory):
+    catalog = inventory.catalog
+    nike = [item for item in catalog.items() if item['brand'] == 'Nike']
+    assert len(nike) == 2
+
+    response = inventory('?brand=nike&limit=1')
+    assert response.headers['X-Total-Count'] == '2'
+    assert [item['filename'] for item in response.get_json()] == [nike[0]['filename']]
+    response = inventory('?brand=nike&offset=1&limit=1')
+    assert [item['filename'] for item in response.get_json()] == [nike[1]['filename']]
+
+    low = min(item['price'] for item in catalog.items())
+    response = inventory(f'?max_price={low}')
+    assert response.headers['X-Total-Count'] == str(sum(item['price'] <= low for item in catalog.items()))
+    assert all(item['price'] <= low for item in response.get_json())
+
+    response = inventory('?offset=2&limit=2')
+    assert response.headers['X-Total-Count'] == str(len(NAMES))
+    assert [item['id'] for item in response.get_json()] == [item['id'] for item in catalog.items()[2:4]]
+    assert inventory('?limit=0').status_code == 400
@@ -0,0 +1,26 @@
+from startup import Startup
+
+
+def test_retry_resumes_from_the_failed_step():
+    calls = []
+    broken = [True]
+
+    def flaky():
+        calls.append('flaky')
+        if broken[0]:
+            raise OSError('camera busy')
+
+    startup = Startup([('first', lambda: calls.append('first')), ('flaky', flaky), ('last', lambda: calls.append('last'))])
+    assert not startup.retry()
+    startup.start()
+    startup._thread.join()
+    assert not startup.ready
+    assert startup.report()['status'] == 'failed'
+    assert startup.error == 'flaky: camera busy'
+
+    broken[0] = False
+    assert startup.retry()
+    assert startup.wait(5)
+    assert calls == ['first', 'flaky', 'flaky', 'last']
+    assert startup.report()['attempts'] == 2
+    assert not startup.retry()